@@ -5,7 +5,6 @@ from discord.ext import commands
 from discord import app_commands
 from dotenv import load_dotenv
 import asyncio
-import config
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, 
@@ -15,21 +14,48 @@ logger = logging.getLogger('discord_bot')
 # Load environment variables
 load_dotenv()
 
+# These read DATABASE_URL, the DB_* settings and the Roblox base URLs on import, so they
+# come after load_dotenv
+import config
+from utils.roblox_api import RobloxClient, close_client, set_client
+from utils.database import close_pool, guild_config, open_pool, set_query_source
+from utils.audit_writer import mod_action_writer
+from utils.transcripts import transcript_archiver
+from utils.ticket_reconciler import ticket_reconciler
+
 # Bot configuration
 intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
 
+class RobloxCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Runs in the command's task, so its queries are logged under the command
+        set_query_source(interaction)
+        return True
+
 class RobloxBot(commands.Bot):
     def __init__(self):
         super().__init__(
             command_prefix=commands.when_mentioned_or('!'),
             intents=intents,
+            tree_cls=RobloxCommandTree,
             application_id=os.getenv('APPLICATION_ID')
         )
         self.synced = False
+        self.roblox = RobloxClient()
         
     async def setup_hook(self):
+        # Open the shared Roblox API session before any cog can use it
+        await self.roblox.start()
+        set_client(self.roblox)
+        
+        # Open the database pool now so the first command doesn't pay for connecting
+        try:
+            await open_pool()
+        except Exception as e:
+            logger.error(f"Database connection error: {e}")
+        
         # Load all cogs
         for cog_file in ["verification", "announcements", "tickets", "moderation", "verification_ticket"]:
             try:
@@ -38,13 +64,44 @@ class RobloxBot(commands.Bot):
             except Exception as e:
                 logger.error(f"Failed to load cog {cog_file}: {e}")
         
-        # Database initialization
+        # Database initialization (a single version check once the schema is current)
         try:
-            from utils.database import create_tables
-            await create_tables()
-            logger.info("Database tables initialized")
+            from utils.database import run_migrations
+            await run_migrations()
+            logger.info("Database schema initialized")
         except Exception as e:
             logger.error(f"Database initialization error: {e}")
+        
+        # Keep cached guild settings in sync with changes made by other instances
+        guild_config.start()
+        
+        # Write moderation actions in batches behind the commands
+        mod_action_writer.start()
+        
+        # Save ticket transcripts in the background before their channels are deleted
+        if not os.getenv("TRANSCRIPT_DIR"):
+            logger.warning(
+                f"TRANSCRIPT_DIR is not set; saving ticket transcripts to {config.TICKET_CONFIG['transcript_dir']!r}, "
+                "which is lost on redeploy unless it is on a persistent disk"
+            )
+        transcript_archiver.start()
+        
+        # Close tickets whose channel was deleted by hand, once the guild cache is loaded
+        ticket_reconciler.start(self)
+    
+    async def close(self):
+        # These talk to Discord, so they stop before the connection does
+        await ticket_reconciler.stop()
+        await transcript_archiver.stop()
+        # Unloads the cogs (stopping the verification poller) and disconnects
+        await super().close()
+        await guild_config.stop()
+        # Write any queued moderation actions before exiting
+        await mod_action_writer.stop()
+        # Last, since the writer's final flush needs a connection; handlers still
+        # finishing get an error from here on rather than a new session or pool
+        await close_client()
+        await close_pool()
     
     async def on_ready(self):
         await self.wait_until_ready()
@@ -4,12 +4,174 @@ from discord.ext import commands
 import asyncio
 import logging
 import datetime
-from typing import Optional, Literal
+from typing import List, Optional, Literal, Tuple
 from utils.embed_builder import create_embed
-from utils.database import execute_query, fetch_query
+from utils.database import fetch_rows, fetchval, set_query_source
+from utils import queries
+from utils.audit_writer import log_mod_action
 
 logger = logging.getLogger('discord_bot.moderation')
 
+# Actions per /modlogs page (fewer if a page would go over Discord's embed size limit)
+MODLOGS_PAGE_SIZE = 10
+
+# Discord rejects embeds over 6000 characters in total
+EMBED_TOTAL_LIMIT = 6000
+
+# Long reasons are cut so a full page fits in one embed
+MODLOGS_REASON_LIMIT = 300
+
+# Cursor for the first page: older than everything
+FIRST_PAGE_CURSOR = (datetime.datetime.max, 0)
+
+def format_duration(duration_seconds: int) -> str:
+    """Format a timeout duration for display"""
+    if duration_seconds < 60:
+        return f"{duration_seconds} seconds"
+    elif duration_seconds < 3600:
+        return f"{duration_seconds // 60} minutes"
+    elif duration_seconds < 86400:
+        return f"{duration_seconds // 3600} hours"
+    else:
+        return f"{duration_seconds // 86400} days"
+
+def format_mod_action(guild: discord.Guild, number: int, log: queries.ModActionRow) -> Tuple[str, str]:
+    """Format a mod_actions row as an embed field name and value"""
+    action_type = log.action_type.capitalize()
+    reason = log.reason
+    if reason and len(reason) > MODLOGS_REASON_LIMIT:
+        reason = reason[:MODLOGS_REASON_LIMIT - 3] + "..."
+    
+    # Get moderator mention
+    moderator = guild.get_member(log.user_id)
+    moderator_mention = moderator.mention if moderator else f"<@{log.user_id}>"
+    
+    # Format the field value
+    field_value = f"**Moderator:** {moderator_mention}\n**Reason:** {reason}\n**When:** <t:{int(log.timestamp.timestamp())}:R>"
+    
+    # Add duration if applicable (for timeouts)
+    if log.duration and log.action_type == "timeout":
+        field_value += f"\n**Duration:** {format_duration(log.duration)}"
+    
+    return f"{number}. {action_type} - {log.timestamp.strftime('%Y-%m-%d %H:%M:%S')}", field_value
+
+class ModLogsView(discord.ui.View):
+    """
+    Pages through a member's moderation history, newest first.
+    
+    Each page is fetched with a keyset cursor (the timestamp and id of the last
+    row shown) rather than an OFFSET, so every page costs the same however far
+    back it is. The cursors of the pages visited so far are kept for Prev.
+    """
+    
+    def __init__(
+        self,
+        author_id: int,
+        guild: discord.Guild,
+        target: discord.Member,
+        action_type: Optional[str] = None,
+        moderator: Optional[discord.Member] = None
+    ):
+        super().__init__(timeout=300)
+        self.author_id = author_id
+        self.guild = guild
+        self.target = target
+        self.action_type = action_type
+        self.moderator = moderator
+        self.message: Optional[discord.Message] = None
+        # Cursor each visited page started from, and how many actions came before it
+        self.cursors: List[Tuple[datetime.datetime, int]] = [FIRST_PAGE_CURSOR]
+        self.offsets: List[int] = [0]
+        self.shown = 0
+        self.next_cursor: Optional[Tuple[datetime.datetime, int]] = None
+    
+    async def load_page(self) -> Optional[discord.Embed]:
+        """Fetch the current page and build its embed, or None if there is nothing to show"""
+        before_timestamp, before_id = self.cursors[-1]
+        logs = await fetch_rows(
+            queries.MOD_ACTIONS_PAGE,
+            self.guild.id, self.target.id, before_timestamp, before_id,
+            self.action_type, self.moderator.id if self.moderator else None,
+            MODLOGS_PAGE_SIZE + 1
+        )
+        if not logs:
+            return None
+        
+        filters = []
+        if self.action_type:
+            filters.append(f"**Action:** {self.action_type.capitalize()}")
+        if self.moderator:
+            filters.append(f"**Moderator:** {self.moderator.mention}")
+        
+        offset = self.offsets[-1]
+        logs_embed = create_embed(
+            title=f"Moderation Logs for {self.target.display_name}",
+            description="\n".join([f"Moderation actions for {self.target.mention}, newest first"] + filters),
+            color=discord.Color.blue()
+        )
+        logs_embed.set_thumbnail(url=self.target.display_avatar.url)
+        logs_embed.set_footer(text=f"Page {len(self.cursors)}")
+        
+        # Add each log entry as a field, stopping early if the embed would get too long
+        self.shown = 0
+        for log in logs[:MODLOGS_PAGE_SIZE]:
+            name, value = format_mod_action(self.guild, offset + self.shown + 1, log)
+            if self.shown and len(logs_embed) + len(name) + len(value) > EMBED_TOTAL_LIMIT:
+                break
+            logs_embed.add_field(name=name, value=value, inline=False)
+            self.shown += 1
+        
+        last = logs[self.shown - 1]
+        self.next_cursor = (last.timestamp, last.id) if len(logs) > self.shown else None
+        
+        self.previous_page.disabled = len(self.cursors) == 1
+        self.next_page.disabled = self.next_cursor is None
+        return logs_embed
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        set_query_source(interaction)
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("You cannot use these buttons.", ephemeral=True)
+            return False
+        return True
+    
+    async def show_page(self, interaction: discord.Interaction):
+        try:
+            logs_embed = await self.load_page()
+        except Exception as e:
+            logger.error(f"Error loading modlogs page: {e}")
+            await interaction.response.send_message(f"An error occurred: {str(e)}", ephemeral=True)
+            return
+        
+        if logs_embed is None:
+            # The actions on this page were deleted in the meantime
+            await interaction.response.edit_message(content="No more moderation logs.", embed=None, view=None)
+            return
+        await interaction.response.edit_message(embed=logs_embed, view=self)
+    
+    @discord.ui.button(label="Prev", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+            self.offsets.pop()
+        await self.show_page(interaction)
+    
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.next_cursor is not None:
+            self.offsets.append(self.offsets[-1] + self.shown)
+            self.cursors.append(self.next_cursor)
+        await self.show_page(interaction)
+    
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message is not None:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
 class Moderation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -73,13 +235,7 @@ class Moderation(commands.Cog):
                     # Perform the kick
                     try:
                         # Log the kick in the database
-                        await execute_query(
-                            """
-                            INSERT INTO mod_actions (guild_id, user_id, target_id, action_type, reason, timestamp)
-                            VALUES ($1, $2, $3, $4, $5, $6)
-                            """,
-                            interaction.guild.id, interaction.user.id, member.id, 'kick', reason, datetime.datetime.now()
-                        )
+                        await log_mod_action(interaction.guild.id, interaction.user.id, member.id, 'kick', reason)
                         
                         # Send DM to the user if possible
                         try:
@@ -238,13 +394,7 @@ class Moderation(commands.Cog):
                     # Perform the ban
                     try:
                         # Log the ban in the database
-                        await execute_query(
-                            """
-                            INSERT INTO mod_actions (guild_id, user_id, target_id, action_type, reason, timestamp)
-                            VALUES ($1, $2, $3, $4, $5, $6)
-                            """,
-                            interaction.guild.id, interaction.user.id, member.id, 'ban', reason, datetime.datetime.now()
-                        )
+                        await log_mod_action(interaction.guild.id, interaction.user.id, member.id, 'ban', reason)
                         
                         # Send DM to the user if possible
                         try:
@@ -367,13 +517,7 @@ class Moderation(commands.Cog):
         
         try:
             # Log the warning in the database
-            await execute_query(
-                """
-                INSERT INTO mod_actions (guild_id, user_id, target_id, action_type, reason, timestamp)
-                VALUES ($1, $2, $3, $4, $5, $6)
-                """,
-                interaction.guild.id, interaction.user.id, member.id, 'warn', reason, datetime.datetime.now()
-            )
+            await log_mod_action(interaction.guild.id, interaction.user.id, member.id, 'warn', reason, durable=True)
             
             # Create warning embed for the channel
             warn_embed = create_embed(
@@ -400,15 +544,7 @@ class Moderation(commands.Cog):
             warn_embed.add_field(name="DM Notification", value="Sent ✅" if dm_sent else "Failed to send ❌", inline=False)
             
             # Get warning count for this user
-            warnings = await fetch_query(
-                """
-                SELECT COUNT(*) as count FROM mod_actions 
-                WHERE guild_id = $1 AND target_id = $2 AND action_type = 'warn'
-                """,
-                interaction.guild.id, member.id
-            )
-            
-            warning_count = warnings[0]['count'] if warnings else 0
+            warning_count = await fetchval(queries.WARN_COUNT, interaction.guild.id, member.id)
             
             # Add warning count field
             warn_embed.add_field(name="Warning Count", value=f"{warning_count} warning(s)", inline=False)
@@ -528,13 +664,7 @@ class Moderation(commands.Cog):
             duration_display = ", ".join(duration_text)
             
             # Log the timeout in the database
-            await execute_query(
-                """
-                INSERT INTO mod_actions (guild_id, user_id, target_id, action_type, reason, timestamp, duration)
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
-                """,
-                interaction.guild.id, interaction.user.id, member.id, 'timeout', reason, datetime.datetime.now(), total_seconds
-            )
+            await log_mod_action(interaction.guild.id, interaction.user.id, member.id, 'timeout', reason, duration=total_seconds)
             
             # Apply timeout
             await member.timeout(until=until, reason=f"Timed out by {interaction.user}: {reason}")
@@ -607,13 +737,7 @@ class Moderation(commands.Cog):
             await member.timeout(until=None, reason=f"Timeout removed by {interaction.user}: {reason}")
             
             # Log the action
-            await execute_query(
-                """
-                INSERT INTO mod_actions (guild_id, user_id, target_id, action_type, reason, timestamp)
-                VALUES ($1, $2, $3, $4, $5, $6)
-                """,
-                interaction.guild.id, interaction.user.id, member.id, 'unmute', reason, datetime.datetime.now()
-            )
+            await log_mod_action(interaction.guild.id, interaction.user.id, member.id, 'unmute', reason)
             
             # Try to send DM to the user
             try:
@@ -728,78 +852,33 @@ class Moderation(commands.Cog):
 
     @app_commands.command(name="modlogs", description="View moderation logs for a user")
     @app_commands.describe(
-        user="The user to check moderation logs for"
+        user="The user to check moderation logs for",
+        action_type="Only show this kind of action",
+        moderator="Only show actions taken by this moderator"
     )
     @app_commands.default_permissions(moderate_members=True)
-    async def modlogs(self, interaction: discord.Interaction, user: discord.Member):
+    async def modlogs(
+        self,
+        interaction: discord.Interaction,
+        user: discord.Member,
+        action_type: Optional[Literal["warn", "kick", "ban", "timeout", "unmute"]] = None,
+        moderator: Optional[discord.Member] = None
+    ):
         """View moderation logs for a specified user"""
         await interaction.response.defer(ephemeral=True)
         
         try:
-            # Get moderation logs for the user
-            logs = await fetch_query(
-                """
-                SELECT action_type, reason, timestamp, user_id, duration
-                FROM mod_actions
-                WHERE guild_id = $1 AND target_id = $2
-                ORDER BY timestamp DESC
-                LIMIT 10
-                """,
-                interaction.guild.id, user.id
-            )
+            view = ModLogsView(interaction.user.id, interaction.guild, user, action_type, moderator)
+            logs_embed = await view.load_page()
             
-            if not logs:
+            if logs_embed is None:
                 await interaction.followup.send(
                     f"No moderation logs found for {user.mention}.",
                     ephemeral=True
                 )
                 return
             
-            # Create embed for moderation logs
-            logs_embed = create_embed(
-                title=f"Moderation Logs for {user.display_name}",
-                description=f"Showing the last {len(logs)} moderation actions for {user.mention}",
-                color=discord.Color.blue()
-            )
-            
-            # Add thumbnail
-            logs_embed.set_thumbnail(url=user.display_avatar.url)
-            
-            # Add each log entry as a field
-            for i, log in enumerate(logs, 1):
-                action_type = log['action_type'].capitalize()
-                reason = log['reason']
-                timestamp = log['timestamp']
-                moderator_id = log['user_id']
-                
-                # Get moderator mention
-                moderator = interaction.guild.get_member(moderator_id)
-                moderator_mention = moderator.mention if moderator else f"<@{moderator_id}>"
-                
-                # Format the field value
-                field_value = f"**Moderator:** {moderator_mention}\n**Reason:** {reason}\n**When:** <t:{int(timestamp.timestamp())}:R>"
-                
-                # Add duration if applicable (for timeouts)
-                if log['duration'] and action_type.lower() == "timeout":
-                    duration_seconds = log['duration']
-                    if duration_seconds < 60:
-                        duration_text = f"{duration_seconds} seconds"
-                    elif duration_seconds < 3600:
-                        duration_text = f"{duration_seconds // 60} minutes"
-                    elif duration_seconds < 86400:
-                        duration_text = f"{duration_seconds // 3600} hours"
-                    else:
-                        duration_text = f"{duration_seconds // 86400} days"
-                    
-                    field_value += f"\n**Duration:** {duration_text}"
-                
-                logs_embed.add_field(
-                    name=f"{i}. {action_type} - {timestamp.strftime('%Y-%m-%d %H:%M:%S')}",
-                    value=field_value,
-                    inline=False
-                )
-            
-            await interaction.followup.send(embed=logs_embed, ephemeral=True)
+            view.message = await interaction.followup.send(embed=logs_embed, view=view, ephemeral=True)
             
         except Exception as e:
             logger.error(f"Error in modlogs command: {e}")
@@ -1,71 +1,134 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-import asyncio
 import logging
 import json
-from datetime import datetime
-from utils.database import execute_query, fetch_query
+from typing import Optional, Tuple
+from utils.database import execute_query, guild_config, set_query_source
+from utils import queries
+from utils.queries import TicketRow
+from utils.ticket_repository import TicketOpening, close_ticket, ticket_index, ticket_opening
+from utils.transcripts import transcript_archiver
 from utils.embed_builder import create_embed
 
 logger = logging.getLogger('discord_bot.tickets')
 
+# The Close and Delete buttons carry their ticket's ID in the custom_id ("ticket:close:42")
+# and are all handled by Tickets.on_interaction, so they keep working after a restart
+# without a view object per ticket
+TICKET_BUTTON_PREFIX = "ticket"
+TICKET_BUTTONS = {
+    "close": ("Close Ticket", discord.ButtonStyle.red, "🔒"),
+    "delete": ("Delete Channel", discord.ButtonStyle.danger, "⛔")
+}
+
+# custom_id of the Close button on tickets opened before the ID was part of it
+LEGACY_CLOSE_CUSTOM_ID = "close_ticket"
+
+# Reply to a click while another bot instance is opening the member's ticket
+TICKET_PENDING_MESSAGE = "Your ticket is already being created and will appear in a moment."
+
+def ticket_button_view(action: str, ticket_id: int) -> discord.ui.View:
+    """Build a message view holding a ticket's Close or Delete button"""
+    label, style, emoji = TICKET_BUTTONS[action]
+    view = discord.ui.View(timeout=None)
+    view.add_item(discord.ui.Button(
+        label=label,
+        style=style,
+        emoji=emoji,
+        custom_id=f"{TICKET_BUTTON_PREFIX}:{action}:{ticket_id}"
+    ))
+    # discord.py doesn't keep stopped views around; the cog handles the clicks
+    view.stop()
+    return view
+
+def parse_ticket_button(custom_id: str) -> Optional[Tuple[str, int]]:
+    """Get the action and ticket ID from a ticket button's custom_id, or None for other components"""
+    parts = custom_id.split(":")
+    if len(parts) != 3 or parts[0] != TICKET_BUTTON_PREFIX or parts[1] not in TICKET_BUTTONS:
+        return None
+    if not parts[2].isdigit():
+        return None
+    return parts[1], int(parts[2])
+
+async def ticket_channel_exists(guild: discord.Guild, channel_id: int) -> bool:
+    """
+    Check whether an open ticket's channel is still there
+    
+    Another instance's new channel may not have reached this instance's cache
+    yet, so a cache miss is confirmed with Discord; only NotFound means the
+    channel was deleted and the ticket is stale.
+    """
+    if guild.get_channel(channel_id) is not None:
+        return True
+    try:
+        await guild.fetch_channel(channel_id)
+    except discord.NotFound:
+        return False
+    except discord.Forbidden:
+        # It exists; we just can't see it
+        return True
+    return True
+
+async def delete_unrecorded_channel(channel: discord.TextChannel):
+    """Delete a ticket channel whose ticket couldn't be recorded"""
+    try:
+        await channel.delete(reason="Ticket could not be recorded")
+    except discord.HTTPException as e:
+        logger.error(f"Error deleting unrecorded ticket channel {channel.id}: {e}")
+
 class TicketView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)  # Persistent view that doesn't timeout
     
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        set_query_source(interaction)
+        return True
+    
     @discord.ui.button(label="Open Ticket", style=discord.ButtonStyle.green, custom_id="open_ticket", emoji="🎫")
     async def open_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Handle ticket creation when the button is clicked"""
-        guild_id = interaction.guild.id
-        user_id = interaction.user.id
-        
-        # Check if user already has an open ticket
-        existing_ticket = await fetch_query(
-            "SELECT channel_id FROM tickets WHERE guild_id = $1 AND user_id = $2 AND status = 'open'",
-            guild_id, user_id
-        )
+        # A second click waits for the first to finish, which can take longer than
+        # Discord allows for a reply
+        await interaction.response.defer(ephemeral=True, thinking=True)
         
-        if existing_ticket:
-            # User already has an open ticket
-            channel_id = existing_ticket[0]['channel_id']
-            channel = interaction.guild.get_channel(channel_id)
-            
-            if channel:
-                await interaction.response.send_message(
-                    f"You already have an open ticket: {channel.mention}",
-                    ephemeral=True
-                )
-            else:
-                # Channel doesn't exist anymore, update database
-                await execute_query(
-                    "UPDATE tickets SET status = 'closed' WHERE channel_id = $1",
-                    channel_id
-                )
-                # Proceed with creating a new ticket
-                await self.create_ticket(interaction)
-        else:
-            # Create a new ticket
-            await self.create_ticket(interaction)
+        try:
+            # Other clicks by this member on this instance wait until this one is done
+            async with ticket_opening(interaction.guild.id, interaction.user.id) as opening:
+                open_channel_id = opening.context.open_channel_id
+                if open_channel_id:
+                    # User already has an open ticket
+                    if await ticket_channel_exists(interaction.guild, open_channel_id):
+                        await interaction.followup.send(
+                            f"You already have an open ticket: <#{open_channel_id}>",
+                            ephemeral=True
+                        )
+                        return
+                    
+                    # Channel doesn't exist anymore; closed along with recording the new ticket
+                    await opening.reserve()
+                
+                if not opening.reserved:
+                    # Another instance is opening one for this member right now
+                    await interaction.followup.send(TICKET_PENDING_MESSAGE, ephemeral=True)
+                    return
+                
+                await self.create_ticket(interaction, opening)
+        except Exception as e:
+            logger.error(f"Error opening ticket: {e}")
+            await interaction.followup.send(
+                "An error occurred while creating your ticket. Please try again later.",
+                ephemeral=True
+            )
     
-    async def create_ticket(self, interaction: discord.Interaction):
-        """Create a new ticket channel"""
+    async def create_ticket(self, interaction: discord.Interaction, opening: TicketOpening):
+        """Create a new ticket channel (the interaction must already be deferred)"""
         guild = interaction.guild
         user = interaction.user
+        context = opening.context
+        support_role_ids = context.support_role_ids
         
-        # Get support role IDs from database
-        support_roles = await fetch_query(
-            "SELECT role_id FROM ticket_support_roles WHERE guild_id = $1",
-            guild.id
-        )
-        
-        # Get ticket category from database
-        category_data = await fetch_query(
-            "SELECT ticket_category_id FROM guild_settings WHERE guild_id = $1",
-            guild.id
-        )
-        
-        category_id = category_data[0]['ticket_category_id'] if category_data else None
+        category_id = context.ticket_category_id
         category = guild.get_channel(category_id) if category_id else None
         
         # Create permissions for the ticket channel
@@ -75,12 +138,13 @@ class TicketView(discord.ui.View):
         }
         
         # Add support roles to overwrites
-        for role_data in support_roles:
-            role = guild.get_role(role_data['role_id'])
+        for role_id in support_role_ids:
+            role = guild.get_role(role_id)
             if role:
                 overwrites[role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
         
         # Create the ticket channel
+        ticket_channel = None
         try:
             ticket_name = f"ticket-{user.name}-{user.discriminator}"
             ticket_channel = await guild.create_text_channel(
@@ -91,13 +155,15 @@ class TicketView(discord.ui.View):
             )
             
             # Add ticket to database
-            await execute_query(
-                """
-                INSERT INTO tickets (guild_id, channel_id, user_id, created_at, status)
-                VALUES ($1, $2, $3, $4, $5)
-                """,
-                guild.id, ticket_channel.id, user.id, datetime.now(), 'open'
-            )
+            existing_channel_id = await opening.record(ticket_channel.id, 'general')
+            if existing_channel_id:
+                # Another instance got in first; keep that one
+                await ticket_channel.delete(reason="Duplicate ticket")
+                await interaction.followup.send(
+                    f"You already have an open ticket: <#{existing_channel_id}>",
+                    ephemeral=True
+                )
+                return
             
             # Create welcome embed for the ticket
             welcome_embed = create_embed(
@@ -110,66 +176,26 @@ class TicketView(discord.ui.View):
                 color=discord.Color.green()
             )
             
-            # Create close ticket button
-            class CloseTicketView(discord.ui.View):
-                def __init__(self):
-                    super().__init__(timeout=None)
-                
-                @discord.ui.button(label="Close Ticket", style=discord.ButtonStyle.red, custom_id="close_ticket", emoji="🔒")
-                async def close_ticket(self, button_interaction: discord.Interaction, button: discord.ui.Button):
-                    if button_interaction.user == user or any(role.id in [r['role_id'] for r in support_roles] for role in button_interaction.user.roles):
-                        close_embed = create_embed(
-                            title="Ticket Closing",
-                            description=f"This ticket was closed by {button_interaction.user.mention}.",
-                            color=discord.Color.red()
-                        )
-                        await button_interaction.response.send_message(embed=close_embed)
-                        
-                        # Update database
-                        await execute_query(
-                            "UPDATE tickets SET status = 'closed', closed_at = $1 WHERE channel_id = $2",
-                            datetime.now(), ticket_channel.id
-                        )
-                        
-                        # Create delete view
-                        delete_view = discord.ui.View()
-                        delete_button = discord.ui.Button(style=discord.ButtonStyle.danger, label="Delete Channel", emoji="⛔")
-                        
-                        async def delete_callback(delete_interaction):
-                            if any(role.id in [r['role_id'] for r in support_roles] for role in delete_interaction.user.roles):
-                                await delete_interaction.response.send_message("Deleting this channel in 5 seconds...")
-                                await asyncio.sleep(5)
-                                await ticket_channel.delete(reason=f"Ticket closed by {delete_interaction.user}")
-                            else:
-                                await delete_interaction.response.send_message("You don't have permission to delete this channel.", ephemeral=True)
-                        
-                        delete_button.callback = delete_callback
-                        delete_view.add_item(delete_button)
-                        
-                        await ticket_channel.send("This ticket is now closed. Staff can delete this channel using the button below:", view=delete_view)
-                        
-                        # Change channel permissions
-                        await ticket_channel.set_permissions(user, send_messages=False)
-                    else:
-                        await button_interaction.response.send_message("Only the ticket creator or support staff can close this ticket.", ephemeral=True)
-            
             # Send the welcome message with the close button
-            await ticket_channel.send(user.mention, embed=welcome_embed, view=CloseTicketView())
+            await ticket_channel.send(user.mention, embed=welcome_embed, view=ticket_button_view("close", opening.ticket_id))
             
             # Notify the user
-            await interaction.response.send_message(
+            await interaction.followup.send(
                 f"Your ticket has been created: {ticket_channel.mention}",
                 ephemeral=True
             )
             
         except discord.Forbidden:
-            await interaction.response.send_message(
+            await interaction.followup.send(
                 "I don't have permission to create channels. Please contact an administrator.",
                 ephemeral=True
             )
         except Exception as e:
             logger.error(f"Error creating ticket channel: {e}")
-            await interaction.response.send_message(
+            if ticket_channel is not None and opening.ticket_id is None:
+                # Don't leave a channel behind that no ticket points to
+                await delete_unrecorded_channel(ticket_channel)
+            await interaction.followup.send(
                 "An error occurred while creating your ticket. Please try again later.",
                 ephemeral=True
             )
@@ -181,6 +207,104 @@ class Tickets(commands.Cog):
         # Register persistent view
         self.bot.add_view(TicketView())
     
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: discord.Interaction):
+        """Handle the Close and Delete buttons of every ticket"""
+        if interaction.type is not discord.InteractionType.component or interaction.guild is None:
+            return
+        
+        custom_id = (interaction.data or {}).get("custom_id", "")
+        if custom_id == LEGACY_CLOSE_CUSTOM_ID:
+            action = "close"
+            ticket_id = None
+        else:
+            parsed = parse_ticket_button(custom_id)
+            if parsed is None:
+                return
+            action, ticket_id = parsed
+        
+        set_query_source(interaction)
+        try:
+            if ticket_id is None:
+                ticket = await ticket_index.get_by_channel(interaction.channel_id)
+            else:
+                ticket = await ticket_index.get(ticket_id)
+        except Exception as e:
+            logger.error(f"Error looking up ticket for {custom_id}: {e}")
+            await interaction.response.send_message(
+                "An error occurred while handling this ticket. Please try again later.",
+                ephemeral=True
+            )
+            return
+        
+        if ticket is None or ticket.guild_id != interaction.guild.id:
+            await interaction.response.send_message("This ticket no longer exists.", ephemeral=True)
+            return
+        
+        if action == "close":
+            await self.close_ticket(interaction, ticket)
+        else:
+            await self.delete_ticket(interaction, ticket)
+    
+    async def is_support_staff(self, member: discord.Member) -> bool:
+        """Check a member against the guild's current support roles"""
+        config = await guild_config.get(member.guild.id)
+        return any(role.id in config.support_role_ids for role in member.roles)
+    
+    async def close_ticket(self, interaction: discord.Interaction, ticket: TicketRow):
+        """Close a ticket and offer staff the Delete button"""
+        if interaction.user.id != ticket.user_id and not await self.is_support_staff(interaction.user):
+            await interaction.response.send_message("Only the ticket creator or support staff can close this ticket.", ephemeral=True)
+            return
+        
+        # Update database
+        if not await close_ticket(ticket.id):
+            if await self.is_support_staff(interaction.user):
+                # Tickets closed before the buttons carried their ID have a Delete button
+                # that stopped working on restart; give staff a working one
+                await interaction.response.send_message(
+                    "This ticket is already closed. You can delete this channel using the button below:",
+                    view=ticket_button_view("delete", ticket.id),
+                    ephemeral=True
+                )
+            else:
+                await interaction.response.send_message("This ticket is already closed.", ephemeral=True)
+            return
+        
+        close_embed = create_embed(
+            title="Ticket Closing",
+            description=f"This ticket was closed by {interaction.user.mention}.",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=close_embed)
+        
+        await interaction.channel.send(
+            "This ticket is now closed. Staff can delete this channel using the button below:",
+            view=ticket_button_view("delete", ticket.id)
+        )
+        
+        # Change channel permissions
+        creator = interaction.guild.get_member(ticket.user_id)
+        if creator:
+            await interaction.channel.set_permissions(creator, send_messages=False)
+    
+    async def delete_ticket(self, interaction: discord.Interaction, ticket: TicketRow):
+        """Archive and delete a ticket's channel (support staff only)"""
+        if not await self.is_support_staff(interaction.user):
+            await interaction.response.send_message("You don't have permission to delete this channel.", ephemeral=True)
+            return
+        
+        if transcript_archiver.is_pending(ticket.id):
+            await interaction.response.send_message("This channel is already being archived.", ephemeral=True)
+            return
+        
+        # The transcript is saved first; the archiver deletes the channel afterwards
+        if not transcript_archiver.submit(ticket, interaction.channel, reason=f"Ticket closed by {interaction.user}"):
+            await interaction.response.send_message("Too many tickets are being archived right now. Please try again in a minute.", ephemeral=True)
+            return
+        
+        await interaction.response.send_message("Saving a transcript of this ticket, then deleting this channel...")
+    
     @app_commands.command(name="sendticket", description="Send a ticket creation message to a channel")
     @app_commands.describe(channel="The channel to send the ticket message to")
     @app_commands.default_permissions(administrator=True)
@@ -237,51 +361,29 @@ class Tickets(commands.Cog):
         guild_id = interaction.guild.id
         
         # Add support role to database
-        await execute_query(
-            """
-            INSERT INTO ticket_support_roles (guild_id, role_id)
-            VALUES ($1, $2)
-            ON CONFLICT (guild_id, role_id) DO NOTHING
-            """,
-            guild_id, role.id
-        )
+        await execute_query(queries.ADD_TICKET_SUPPORT_ROLE, guild_id, role.id)
         
         # If category provided, update guild settings
         if category:
-            await execute_query(
-                """
-                INSERT INTO guild_settings (guild_id, ticket_category_id)
-                VALUES ($1, $2)
-                ON CONFLICT (guild_id) DO UPDATE SET
-                ticket_category_id = $2
-                """,
-                guild_id, category.id
-            )
+            await execute_query(queries.SET_TICKET_CATEGORY, guild_id, category.id)
         
-        # Get all current support roles
-        support_roles = await fetch_query(
-            "SELECT role_id FROM ticket_support_roles WHERE guild_id = $1",
-            guild_id
-        )
+        # Drop the cached settings right away; other instances hear about it through NOTIFY
+        guild_config.invalidate(guild_id)
+        
+        # Get all current support roles and the category in one query
+        config = await guild_config.get(guild_id)
         
         role_mentions = []
-        for role_data in support_roles:
-            role_id = role_data['role_id']
+        for role_id in config.support_role_ids:
             role_obj = interaction.guild.get_role(role_id)
             if role_obj:
                 role_mentions.append(role_obj.mention)
         
         roles_text = ", ".join(role_mentions) if role_mentions else "None"
         
-        # Get current category
-        category_data = await fetch_query(
-            "SELECT ticket_category_id FROM guild_settings WHERE guild_id = $1",
-            guild_id
-        )
-        
         category_text = "None"
-        if category_data and category_data[0]['ticket_category_id']:
-            category_obj = interaction.guild.get_channel(category_data[0]['ticket_category_id'])
+        if config.ticket_category_id:
+            category_obj = interaction.guild.get_channel(config.ticket_category_id)
             if category_obj:
                 category_text = category_obj.mention
         
@@ -7,16 +7,71 @@ import re
 import os
 import random
 import string
-from utils.database import execute_query, fetch_query
+from utils.database import execute_query, fetchrow, fetchval, guild_config, set_query_source
+from utils import queries
 from utils.embed_builder import create_embed
-from utils.roblox_api import get_roblox_user, verify_roblox_user
+from utils.roblox_api import get_roblox_user, get_roblox_avatar, RobloxUnavailableError, FIELDS_BASIC, FIELDS_FULL
+from utils.verification_poller import VerificationPoller
+from config import VERIFICATION_CONFIG
 
 logger = logging.getLogger('discord_bot.verification')
 
+# How many times a Roblox lookup is retried while Roblox is busy before giving up
+ROBLOX_BUSY_RETRIES = 2
+
+ROBLOX_BUSY_MESSAGE = "Roblox is busy right now. Please try again in a minute."
+
+def busy_retry_delay(error: RobloxUnavailableError) -> float:
+    """How long to wait before retrying a lookup that Roblox was too busy to answer"""
+    return min(max(error.retry_after or 0, 2), 10)
+
+async def edit_message(interaction: discord.Interaction, **kwargs):
+    """Edit the message a button belongs to, whether or not the interaction was answered yet"""
+    if interaction.response.is_done():
+        await interaction.edit_original_response(**kwargs)
+    else:
+        await interaction.response.edit_message(**kwargs)
+
 class Verification(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        
+        self.poller = VerificationPoller(
+            min_interval=VERIFICATION_CONFIG["poll_min_interval"],
+            max_interval=VERIFICATION_CONFIG["poll_max_interval"],
+            backoff=VERIFICATION_CONFIG["poll_backoff"],
+            session_timeout=VERIFICATION_CONFIG["session_timeout"],
+            requests_per_second=VERIFICATION_CONFIG["poll_requests_per_second"],
+            batch_size=VERIFICATION_CONFIG["poll_batch_size"]
+        )
+    
+    async def cog_load(self):
+        self.poller.start()
+    
+    async def cog_unload(self):
+        await self.poller.stop()
+    
+    async def lookup_roblox_user(self, interaction: discord.Interaction, roblox_username: str, fields: str = FIELDS_FULL, live: bool = False):
+        """Look up a Roblox user, retrying while Roblox is busy"""
+        notified = False
+        try:
+            for attempt in range(ROBLOX_BUSY_RETRIES + 1):
+                try:
+                    return await get_roblox_user(roblox_username, fields=fields, live=live)
+                except RobloxUnavailableError as e:
+                    if attempt == ROBLOX_BUSY_RETRIES:
+                        raise
+                    delay = busy_retry_delay(e)
+                    await interaction.edit_original_response(content=f"Roblox is busy, retrying in {delay:.0f} seconds...")
+                    notified = True
+                    await asyncio.sleep(delay)
+        finally:
+            if notified:
+                # The result is sent as a followup, so don't leave the notice behind it
+                try:
+                    await interaction.delete_original_response()
+                except discord.HTTPException as e:
+                    logger.warning(f"Could not remove the Roblox busy notice: {e}")
+    
     @app_commands.command(name="verify", description="Verify your Roblox account with Discord")
     @app_commands.describe(roblox_username="Your Roblox username")
     async def verify(self, interaction: discord.Interaction, roblox_username: str):
@@ -27,10 +82,7 @@ class Verification(commands.Cog):
         discord_username = str(interaction.user)
         
         # Check if user is already verified
-        existing_user = await fetch_query(
-            "SELECT roblox_id FROM verified_users WHERE discord_id = $1",
-            discord_id
-        )
+        existing_user = await fetchrow(queries.VERIFIED_USER_BY_DISCORD_ID, discord_id)
         
         if existing_user:
             await interaction.followup.send(
@@ -39,8 +91,14 @@ class Verification(commands.Cog):
             )
             return
         
-        # Get Roblox user info
-        roblox_user = await get_roblox_user(roblox_username)
+        # Get Roblox user info (the description is only needed later, when the code is checked).
+        # Resolved live: a cached name may since have been taken by another account
+        try:
+            roblox_user = await self.lookup_roblox_user(interaction, roblox_username, fields=FIELDS_BASIC, live=True)
+        except RobloxUnavailableError:
+            await interaction.followup.send(ROBLOX_BUSY_MESSAGE, ephemeral=True)
+            return
+        
         if not roblox_user:
             await interaction.followup.send(
                 f"Could not find a Roblox user with username: `{roblox_username}`",
@@ -50,6 +108,7 @@ class Verification(commands.Cog):
         
         roblox_id = roblox_user["id"]
         roblox_display_name = roblox_user["displayName"]
+        avatar_url = await get_roblox_avatar(roblox_id)
         
         # Generate random verification code like "Verify-L6AQ"
         random_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
@@ -67,106 +126,163 @@ class Verification(commands.Cog):
             color=discord.Color.blue()
         )
         
-        verify_embed.set_thumbnail(url=f"https://www.roblox.com/bust-thumbnail/image?userId={roblox_id}&width=150&height=150")
+        if avatar_url:
+            verify_embed.set_thumbnail(url=avatar_url)
         
         # Create verification button
         verify_button = discord.ui.Button(style=discord.ButtonStyle.green, label="Verify")
         cancel_button = discord.ui.Button(style=discord.ButtonStyle.red, label="Cancel")
         
-        async def verify_callback(button_interaction):
-            # Check if the verification code is in the profile
-            is_verified = await verify_roblox_user(roblox_id, verification_code)
-            
-            if is_verified:
-                # Store verification in database
+        get_help_button = discord.ui.Button(
+            style=discord.ButtonStyle.primary, 
+            label="Get Help With Verification", 
+            emoji="🎫"
+        )
+        
+        # Called by the poller as soon as the code shows up in the profile
+        async def complete_verification(session):
+            # Store verification in database
+            try:
                 await execute_query(
-                    """
-                    INSERT INTO verified_users (discord_id, discord_username, roblox_id, roblox_username)
-                    VALUES ($1, $2, $3, $4)
-                    """,
+                    queries.INSERT_VERIFIED_USER,
                     discord_id, discord_username, roblox_id, roblox_username
                 )
-                
-                # Try to give verified role if it exists
-                try:
-                    guild = button_interaction.guild
-                    if guild:
-                        verified_role_id = await fetch_query(
-                            "SELECT verified_role_id FROM guild_settings WHERE guild_id = $1",
-                            guild.id
-                        )
-                        
-                        if verified_role_id:
-                            verified_role = guild.get_role(verified_role_id[0]['verified_role_id'])
-                            if verified_role:
-                                await interaction.user.add_roles(verified_role)
-                                
-                        # Try to update nickname if we have permission
-                        try:
-                            # Format nickname as "DisplayName (@username)"
-                            new_nickname = f"{roblox_display_name} (@{roblox_username})"
-                            # Make sure it fits within Discord's 32 character limit
-                            if len(new_nickname) > 32:
-                                # If too long, prioritize the display name and truncate username
-                                max_username_len = 32 - len(roblox_display_name) - 4  # 4 chars for " (@)"
-                                if max_username_len > 0:
-                                    new_nickname = f"{roblox_display_name} (@{roblox_username[:max_username_len]})"
-                                else:
-                                    # Last resort: just use display name truncated to 32 chars
-                                    new_nickname = roblox_display_name[:32]
-                            
-                            await interaction.user.edit(nick=new_nickname)
-                            logger.info(f"Updated nickname for {interaction.user.id} to {new_nickname}")
-                        except discord.Forbidden:
-                            logger.warning(f"Could not update nickname for {interaction.user.id} - Missing permissions")
-                except Exception as e:
-                    logger.error(f"Error giving verified role: {e}")
-                
-                success_embed = create_embed(
-                    title="Verification Successful",
-                    description=f"You have been verified as **{roblox_display_name}** (@{roblox_username})!",
-                    color=discord.Color.green()
-                )
-                
-                success_embed.set_thumbnail(url=f"https://www.roblox.com/bust-thumbnail/image?userId={roblox_id}&width=150&height=150")
-                
-                await button_interaction.response.edit_message(embed=success_embed, view=None)
-            else:
-                failure_embed = create_embed(
-                    title="Verification Failed",
-                    description=(
-                        f"Could not find the verification code in your Roblox profile. "
-                        f"Please make sure you added:\n\n"
-                        f"```{verification_code}```\n\n"
-                        f"to your profile description and try again, or click the button below to get help."
+            except Exception as e:
+                # Keep the session going so the write is tried again
+                logger.error(f"Error saving verification for {discord_id}: {e}")
+                self.poller.retry(session)
+                await message.edit(
+                    content=None,
+                    embed=create_embed(
+                        title="Verification Not Saved",
+                        description=(
+                            "We found the code in your profile but couldn't save your verification. "
+                            "We'll try again in a few seconds, or click **Verify** to retry now."
+                        ),
+                        color=discord.Color.red()
                     ),
-                    color=discord.Color.red()
+                    view=view
                 )
-                
-                # Create help button view
-                help_view = discord.ui.View()
-                get_help_button = discord.ui.Button(
-                    style=discord.ButtonStyle.primary, 
-                    label="Get Help With Verification", 
-                    emoji="🎫"
+                return
+            
+            # Try to give verified role if it exists
+            try:
+                guild = interaction.guild
+                if guild:
+                    config = await guild_config.get(guild.id)
+                    
+                    if config.verified_role_id:
+                        verified_role = guild.get_role(config.verified_role_id)
+                        if verified_role:
+                            await interaction.user.add_roles(verified_role)
+                            
+                    # Try to update nickname if we have permission
+                    try:
+                        # Format nickname as "DisplayName (@username)"
+                        new_nickname = f"{roblox_display_name} (@{roblox_username})"
+                        # Make sure it fits within Discord's 32 character limit
+                        if len(new_nickname) > 32:
+                            # If too long, prioritize the display name and truncate username
+                            max_username_len = 32 - len(roblox_display_name) - 4  # 4 chars for " (@)"
+                            if max_username_len > 0:
+                                new_nickname = f"{roblox_display_name} (@{roblox_username[:max_username_len]})"
+                            else:
+                                # Last resort: just use display name truncated to 32 chars
+                                new_nickname = roblox_display_name[:32]
+                        
+                        await interaction.user.edit(nick=new_nickname)
+                        logger.info(f"Updated nickname for {interaction.user.id} to {new_nickname}")
+                    except discord.Forbidden:
+                        logger.warning(f"Could not update nickname for {interaction.user.id} - Missing permissions")
+            except Exception as e:
+                logger.error(f"Error giving verified role: {e}")
+            
+            success_embed = create_embed(
+                title="Verification Successful",
+                description=f"You have been verified as **{roblox_display_name}** (@{roblox_username})!",
+                color=discord.Color.green()
+            )
+            
+            if avatar_url:
+                success_embed.set_thumbnail(url=avatar_url)
+            
+            await message.edit(content=None, embed=success_embed, view=None)
+        
+        async def expire_verification(session):
+            await message.edit(
+                content=None,
+                embed=create_embed(
+                    title="Verification Expired",
+                    description="We couldn't find the verification code in time. Please run `/verify` again.",
+                    color=discord.Color.light_gray()
+                ),
+                view=None
+            )
+        
+        async def verify_callback(button_interaction):
+            set_query_source(button_interaction)
+            # The profile is checked in the background, so just report the latest result
+            if session is None or session.verified:
+                # The link is being completed and this message will update shortly
+                await button_interaction.response.defer()
+                return
+            
+            if not session.active:
+                await edit_message(
+                    button_interaction,
+                    content=None,
+                    embed=create_embed(
+                        title="Verification Expired",
+                        description="This verification is no longer active. Please run `/verify` again.",
+                        color=discord.Color.light_gray()
+                    ),
+                    view=None
                 )
-                
-                # Create the callback for the help button
-                async def help_callback(help_interaction):
-                    from cogs.verification_ticket import VerificationTicketView
-                    ticket_view = VerificationTicketView(
-                        roblox_username=roblox_username,
-                        roblox_id=roblox_id,
-                        verification_code=verification_code
-                    )
-                    await ticket_view.create_verification_support_ticket(help_interaction)
-                
-                get_help_button.callback = help_callback
-                help_view.add_item(get_help_button)
-                
-                await button_interaction.response.edit_message(embed=failure_embed, view=help_view)
+                return
+            
+            # Check again soon, in case the code was only just added
+            self.poller.nudge(session)
+            
+            if session.completion_failed:
+                # The message already says saving failed; the nudge retries it
+                await button_interaction.response.defer()
+                return
+            
+            if session.busy:
+                await edit_message(button_interaction, content="Roblox is busy, retrying automatically...")
+                return
+            
+            failure_embed = create_embed(
+                title="Verification Failed",
+                description=(
+                    f"Could not find the verification code in your Roblox profile. "
+                    f"Please make sure you added:\n\n"
+                    f"```{verification_code}```\n\n"
+                    f"to your profile description. We'll keep checking and verify you automatically "
+                    f"as soon as it shows up, or click the button below to get help."
+                ),
+                color=discord.Color.red()
+            )
+            
+            if get_help_button not in view.children:
+                view.add_item(get_help_button)
+            
+            await edit_message(button_interaction, content=None, embed=failure_embed, view=view)
+        
+        # Create the callback for the help button
+        async def help_callback(help_interaction):
+            from cogs.verification_ticket import VerificationTicketView
+            ticket_view = VerificationTicketView(
+                roblox_username=roblox_username,
+                roblox_id=roblox_id,
+                verification_code=verification_code
+            )
+            await ticket_view.create_verification_support_ticket(help_interaction)
         
         async def cancel_callback(button_interaction):
+            view.stop()
+            if session is not None:
+                self.poller.cancel(session)
             await button_interaction.response.edit_message(
                 embed=create_embed(
                     title="Verification Cancelled",
@@ -178,12 +294,27 @@ class Verification(commands.Cog):
         
         verify_button.callback = verify_callback
         cancel_button.callback = cancel_callback
+        get_help_button.callback = help_callback
         
-        view = discord.ui.View()
+        view = discord.ui.View(timeout=VERIFICATION_CONFIG["session_timeout"])
         view.add_item(verify_button)
         view.add_item(cancel_button)
         
-        await interaction.followup.send(embed=verify_embed, view=view, ephemeral=True)
+        # Set once the message is sent; a click before then is just acknowledged
+        session = None
+        message = await interaction.followup.send(embed=verify_embed, view=view, ephemeral=True, wait=True)
+        if view.is_finished():
+            # Cancelled before the message was even returned
+            return
+        
+        # Watch the profile for the code in the background
+        session = self.poller.add(
+            discord_id,
+            roblox_id,
+            verification_code,
+            on_verified=complete_verification,
+            on_expired=expire_verification
+        )
 
     @app_commands.command(name="update", description="Update your linked Roblox account")
     @app_commands.describe(roblox_username="Your new Roblox username")
@@ -195,10 +326,7 @@ class Verification(commands.Cog):
         discord_username = str(interaction.user)
         
         # Check if user is already verified
-        existing_user = await fetch_query(
-            "SELECT roblox_id, roblox_username FROM verified_users WHERE discord_id = $1",
-            discord_id
-        )
+        existing_user = await fetchrow(queries.VERIFIED_USER_BY_DISCORD_ID, discord_id)
         
         if not existing_user:
             await interaction.followup.send(
@@ -207,10 +335,16 @@ class Verification(commands.Cog):
             )
             return
         
-        current_roblox_username = existing_user[0]['roblox_username']
+        current_roblox_username = existing_user.roblox_username
+        
+        # Get Roblox user info for the new username (the description is only needed when the code is checked).
+        # Resolved live: a cached name may since have been taken by another account
+        try:
+            roblox_user = await self.lookup_roblox_user(interaction, roblox_username, fields=FIELDS_BASIC, live=True)
+        except RobloxUnavailableError:
+            await interaction.followup.send(ROBLOX_BUSY_MESSAGE, ephemeral=True)
+            return
         
-        # Get Roblox user info for the new username
-        roblox_user = await get_roblox_user(roblox_username)
         if not roblox_user:
             await interaction.followup.send(
                 f"Could not find a Roblox user with username: `{roblox_username}`",
@@ -220,6 +354,7 @@ class Verification(commands.Cog):
         
         roblox_id = roblox_user["id"]
         roblox_display_name = roblox_user["displayName"]
+        avatar_url = await get_roblox_avatar(roblox_id)
         
         # Generate random verification code like "Verify-L6AQ"
         random_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
@@ -238,91 +373,150 @@ class Verification(commands.Cog):
             color=discord.Color.blue()
         )
         
-        update_embed.set_thumbnail(url=f"https://www.roblox.com/bust-thumbnail/image?userId={roblox_id}&width=150&height=150")
+        if avatar_url:
+            update_embed.set_thumbnail(url=avatar_url)
         
         # Create update button
         update_button = discord.ui.Button(style=discord.ButtonStyle.green, label="Update")
         cancel_button = discord.ui.Button(style=discord.ButtonStyle.red, label="Cancel")
         
-        async def update_callback(button_interaction):
-            # Check if the verification code is in the profile
-            is_verified = await verify_roblox_user(roblox_id, verification_code)
-            
-            if is_verified:
-                # Update verification in database
+        get_help_button = discord.ui.Button(
+            style=discord.ButtonStyle.primary, 
+            label="Get Help With Verification", 
+            emoji="🎫"
+        )
+        
+        # Called by the poller as soon as the code shows up in the profile
+        async def complete_update(session):
+            # Update verification in database
+            try:
                 await execute_query(
-                    """
-                    UPDATE verified_users
-                    SET roblox_id = $1, roblox_username = $2, discord_username = $3
-                    WHERE discord_id = $4
-                    """,
+                    queries.UPDATE_VERIFIED_USER,
                     roblox_id, roblox_username, discord_username, discord_id
                 )
-                
-                # Try to update nickname if we have permission
-                try:
-                    # Format nickname as "DisplayName (@username)"
-                    new_nickname = f"{roblox_display_name} (@{roblox_username})"
-                    # Make sure it fits within Discord's 32 character limit
-                    if len(new_nickname) > 32:
-                        # If too long, prioritize the display name and truncate username
-                        max_username_len = 32 - len(roblox_display_name) - 4  # 4 chars for " (@)"
-                        if max_username_len > 0:
-                            new_nickname = f"{roblox_display_name} (@{roblox_username[:max_username_len]})"
-                        else:
-                            # Last resort: just use display name truncated to 32 chars
-                            new_nickname = roblox_display_name[:32]
-                    
-                    await interaction.user.edit(nick=new_nickname)
-                    logger.info(f"Updated nickname for {interaction.user.id} to {new_nickname}")
-                except discord.Forbidden:
-                    logger.warning(f"Could not update nickname for {interaction.user.id} - Missing permissions")
-                
-                success_embed = create_embed(
-                    title="Update Successful",
-                    description=f"Your account has been updated to **{roblox_display_name}** (@{roblox_username})!",
-                    color=discord.Color.green()
-                )
-                
-                success_embed.set_thumbnail(url=f"https://www.roblox.com/bust-thumbnail/image?userId={roblox_id}&width=150&height=150")
-                
-                await button_interaction.response.edit_message(embed=success_embed, view=None)
-            else:
-                failure_embed = create_embed(
-                    title="Update Failed",
-                    description=(
-                        f"Could not find the verification code in your Roblox profile. "
-                        f"Please make sure you added:\n\n"
-                        f"```{verification_code}```\n\n"
-                        f"to your profile description and try again, or click the button below to get help."
+            except Exception as e:
+                # Keep the session going so the write is tried again
+                logger.error(f"Error saving update for {discord_id}: {e}")
+                self.poller.retry(session)
+                await message.edit(
+                    content=None,
+                    embed=create_embed(
+                        title="Update Not Saved",
+                        description=(
+                            "We found the code in your profile but couldn't save your account update. "
+                            "We'll try again in a few seconds, or click **Update** to retry now."
+                        ),
+                        color=discord.Color.red()
                     ),
-                    color=discord.Color.red()
+                    view=view
                 )
+                return
+            
+            # Try to update nickname if we have permission
+            try:
+                # Format nickname as "DisplayName (@username)"
+                new_nickname = f"{roblox_display_name} (@{roblox_username})"
+                # Make sure it fits within Discord's 32 character limit
+                if len(new_nickname) > 32:
+                    # If too long, prioritize the display name and truncate username
+                    max_username_len = 32 - len(roblox_display_name) - 4  # 4 chars for " (@)"
+                    if max_username_len > 0:
+                        new_nickname = f"{roblox_display_name} (@{roblox_username[:max_username_len]})"
+                    else:
+                        # Last resort: just use display name truncated to 32 chars
+                        new_nickname = roblox_display_name[:32]
                 
-                # Create help button view
-                help_view = discord.ui.View()
-                get_help_button = discord.ui.Button(
-                    style=discord.ButtonStyle.primary, 
-                    label="Get Help With Verification", 
-                    emoji="🎫"
+                await interaction.user.edit(nick=new_nickname)
+                logger.info(f"Updated nickname for {interaction.user.id} to {new_nickname}")
+            except discord.Forbidden:
+                logger.warning(f"Could not update nickname for {interaction.user.id} - Missing permissions")
+            
+            success_embed = create_embed(
+                title="Update Successful",
+                description=f"Your account has been updated to **{roblox_display_name}** (@{roblox_username})!",
+                color=discord.Color.green()
+            )
+            
+            if avatar_url:
+                success_embed.set_thumbnail(url=avatar_url)
+            
+            await message.edit(content=None, embed=success_embed, view=None)
+        
+        async def expire_update(session):
+            await message.edit(
+                content=None,
+                embed=create_embed(
+                    title="Update Expired",
+                    description="We couldn't find the verification code in time. Please run `/update` again.",
+                    color=discord.Color.light_gray()
+                ),
+                view=None
+            )
+        
+        async def update_callback(button_interaction):
+            set_query_source(button_interaction)
+            # The profile is checked in the background, so just report the latest result
+            if session is None or session.verified:
+                # The update is being completed and this message will update shortly
+                await button_interaction.response.defer()
+                return
+            
+            if not session.active:
+                await edit_message(
+                    button_interaction,
+                    content=None,
+                    embed=create_embed(
+                        title="Update Expired",
+                        description="This update is no longer active. Please run `/update` again.",
+                        color=discord.Color.light_gray()
+                    ),
+                    view=None
                 )
-                
-                # Create the callback for the help button
-                async def help_callback(help_interaction):
-                    from cogs.verification_ticket import VerificationTicketView
-                    ticket_view = VerificationTicketView(
-                        roblox_username=roblox_username,
-                        roblox_id=roblox_id,
-                        verification_code=verification_code
-                    )
-                    await ticket_view.create_verification_support_ticket(help_interaction)
-                
-                get_help_button.callback = help_callback
-                help_view.add_item(get_help_button)
-                
-                await button_interaction.response.edit_message(embed=failure_embed, view=help_view)
+                return
+            
+            # Check again soon, in case the code was only just added
+            self.poller.nudge(session)
+            
+            if session.completion_failed:
+                # The message already says saving failed; the nudge retries it
+                await button_interaction.response.defer()
+                return
+            
+            if session.busy:
+                await edit_message(button_interaction, content="Roblox is busy, retrying automatically...")
+                return
+            
+            failure_embed = create_embed(
+                title="Update Failed",
+                description=(
+                    f"Could not find the verification code in your Roblox profile. "
+                    f"Please make sure you added:\n\n"
+                    f"```{verification_code}```\n\n"
+                    f"to your profile description. We'll keep checking and update your account automatically "
+                    f"as soon as it shows up, or click the button below to get help."
+                ),
+                color=discord.Color.red()
+            )
+            
+            if get_help_button not in view.children:
+                view.add_item(get_help_button)
+            
+            await edit_message(button_interaction, content=None, embed=failure_embed, view=view)
+        
+        # Create the callback for the help button
+        async def help_callback(help_interaction):
+            from cogs.verification_ticket import VerificationTicketView
+            ticket_view = VerificationTicketView(
+                roblox_username=roblox_username,
+                roblox_id=roblox_id,
+                verification_code=verification_code
+            )
+            await ticket_view.create_verification_support_ticket(help_interaction)
         
         async def cancel_callback(button_interaction):
+            view.stop()
+            if session is not None:
+                self.poller.cancel(session)
             await button_interaction.response.edit_message(
                 embed=create_embed(
                     title="Update Cancelled",
@@ -334,12 +528,27 @@ class Verification(commands.Cog):
         
         update_button.callback = update_callback
         cancel_button.callback = cancel_callback
+        get_help_button.callback = help_callback
         
-        view = discord.ui.View()
+        view = discord.ui.View(timeout=VERIFICATION_CONFIG["session_timeout"])
         view.add_item(update_button)
         view.add_item(cancel_button)
         
-        await interaction.followup.send(embed=update_embed, view=view, ephemeral=True)
+        # Set once the message is sent; a click before then is just acknowledged
+        session = None
+        message = await interaction.followup.send(embed=update_embed, view=view, ephemeral=True, wait=True)
+        if view.is_finished():
+            # Cancelled before the message was even returned
+            return
+        
+        # Watch the profile for the code in the background
+        session = self.poller.add(
+            discord_id,
+            roblox_id,
+            verification_code,
+            on_verified=complete_update,
+            on_expired=expire_update
+        )
     
     @app_commands.command(name="info-roblox", description="Get information about a Roblox user")
     @app_commands.describe(roblox_username="Roblox username to look up")
@@ -348,7 +557,12 @@ class Verification(commands.Cog):
         await interaction.response.defer()
         
         # Get Roblox user info
-        roblox_user = await get_roblox_user(roblox_username)
+        try:
+            roblox_user = await self.lookup_roblox_user(interaction, roblox_username)
+        except RobloxUnavailableError:
+            await interaction.followup.send(ROBLOX_BUSY_MESSAGE, ephemeral=True)
+            return
+        
         if not roblox_user:
             await interaction.followup.send(
                 f"Could not find a Roblox user with username: `{roblox_username}`",
@@ -361,10 +575,10 @@ class Verification(commands.Cog):
         created_date = roblox_user.get("created", "Unknown")
         description = roblox_user.get("description", "No description")
         
-        # Check if this Roblox user is verified with any Discord user
-        verified_user = await fetch_query(
-            "SELECT discord_id FROM verified_users WHERE roblox_id = $1",
-            roblox_id
+        # Check if this Roblox user is verified with any Discord user, while fetching the avatar
+        discord_id, avatar_url = await asyncio.gather(
+            fetchval(queries.DISCORD_ID_BY_ROBLOX_ID, roblox_id),
+            get_roblox_avatar(roblox_id)
         )
         
         # Create embed with user info
@@ -374,7 +588,8 @@ class Verification(commands.Cog):
             color=discord.Color.blue()
         )
         
-        info_embed.set_thumbnail(url=f"https://www.roblox.com/bust-thumbnail/image?userId={roblox_id}&width=150&height=150")
+        if avatar_url:
+            info_embed.set_thumbnail(url=avatar_url)
         
         # Add account creation date if available
         if created_date != "Unknown":
@@ -387,8 +602,7 @@ class Verification(commands.Cog):
         info_embed.add_field(name="Profile URL", value=f"https://www.roblox.com/users/{roblox_id}/profile", inline=True)
         
         # Add verification status
-        if verified_user:
-            discord_id = verified_user[0]['discord_id']
+        if discord_id:
             discord_member = interaction.guild.get_member(discord_id)
             discord_mention = f"<@{discord_id}>" if discord_member else f"User ID: {discord_id}"
             info_embed.add_field(name="Verified With", value=discord_mention, inline=False)
@@ -45,7 +45,21 @@ VERIFICATION_CONFIG: Dict[str, Any] = {
     "assign_role": True,
     
     # Default format for nicknames (supports placeholders: {roblox_name}, {discord_name})
-    "nickname_format": "{roblox_name}"
+    "nickname_format": "{roblox_name}",
+    
+    # Background polling of pending verification codes (intervals in seconds)
+    "poll_min_interval": 5,
+    "poll_max_interval": 30,
+    "poll_backoff": 1.5,
+    
+    # Maximum number of profile checks per second across all pending verifications
+    "poll_requests_per_second": 5,
+    
+    # Maximum number of sessions checked in one polling round
+    "poll_batch_size": 10,
+    
+    # How long a verification stays pending (kept under Discord's 15 minute interaction token lifetime)
+    "session_timeout": 840
 }
 
 # Ticket system configuration
@@ -64,5 +78,196 @@ TICKET_CONFIG: Dict[str, Any] = {
     ),
     
     # Default name format for ticket channels
-    "ticket_channel_format": "ticket-{username}"
+    "ticket_channel_format": "ticket-{username}",
+    
+    # Where transcripts of deleted ticket channels are saved. Tickets keep the file's path,
+    # so in production this must be on a persistent disk: the default, relative to the
+    # working directory, is wiped on every redeploy on hosts like Render
+    "transcript_dir": os.getenv("TRANSCRIPT_DIR", "transcripts"),
+    
+    # Number of ticket channels archived at the same time
+    "transcript_workers": 2,
+    
+    # Maximum number of ticket channels waiting to be archived
+    "transcript_max_queue": 100,
+    
+    # Messages compressed and written to disk at a time
+    "transcript_page_size": 100,
+    
+    # Seconds between sweeps that close open tickets whose channel was deleted
+    "reconcile_interval": 900,
+    
+    # Tickets younger than this (in seconds) are left alone, as their channel may
+    # not have reached the gateway cache yet
+    "reconcile_grace": 120,
+    
+    # Orphaned tickets closed per UPDATE
+    "reconcile_batch_size": 500
+}
+
+# Roblox API client configuration
+ROBLOX_API_CONFIG: Dict[str, Any] = {
+    # Maximum number of open connections across all Roblox hosts
+    "connection_limit": 100,
+    
+    # Maximum number of open connections to a single Roblox host
+    "connection_limit_per_host": 20,
+    
+    # How long idle keep-alive connections are kept open (in seconds)
+    "keepalive_timeout": 30,
+    
+    # How long resolved DNS entries are cached (in seconds)
+    "dns_cache_ttl": 300,
+    
+    # Request timeouts (in seconds)
+    "timeouts": {
+        "total": 10,
+        "connect": 3,
+        "sock_read": 8
+    },
+    
+    # Client-side rate limit applied to each Roblox host
+    "rate_limit": {
+        "requests_per_second": 10,
+        "burst": 20
+    },
+    
+    # Retries for rate limited (429) and failed (5xx, timeout) requests
+    "retries": {
+        "max_retries": 3,
+        "backoff_base": 0.5,
+        "backoff_max": 8,
+        # Give up straight away if Roblox asks us to wait longer than this (in seconds)
+        "max_retry_after": 15
+    },
+    
+    # Stop calling a Roblox host for a while after repeated failures
+    "circuit_breaker": {
+        "failure_threshold": 5,
+        "recovery_timeout": 30
+    }
+}
+
+# Roblox lookup cache configuration
+ROBLOX_CACHE_CONFIG: Dict[str, Any] = {
+    # Maximum number of entries kept per cache before the least recently used are evicted
+    "max_entries": 5000,
+    
+    # How long found users are cached (in seconds)
+    "ttl": 300,
+    
+    # How long "user not found" results are cached (in seconds)
+    "negative_ttl": 60,
+    
+    # How long avatar thumbnail URLs are cached (in seconds)
+    "thumbnail_ttl": 3600,
+    
+    # Profiles stored in the database older than this are served, then refreshed in the background (in seconds)
+    "profile_soft_ttl": 6 * 3600,
+    
+    # Profiles stored in the database older than this are ignored and fetched again (in seconds)
+    "profile_hard_ttl": 30 * 86400,
+    
+    # Keep fetched profiles in the roblox_profiles table so they survive restarts
+    "persist_profiles": True
+}
+
+# Roblox request batching configuration
+ROBLOX_BATCH_CONFIG: Dict[str, Any] = {
+    # How long to gather username lookups before sending them together (in seconds)
+    "username_window": 0.01,
+    
+    # Maximum number of usernames sent in one request
+    "username_batch_size": 100,
+    
+    # How long to gather avatar thumbnail lookups before sending them together (in seconds)
+    "thumbnail_window": 0.01,
+    
+    # Maximum number of user IDs sent in one thumbnail request
+    "thumbnail_batch_size": 100,
+    
+    # Thumbnail size requested from Roblox
+    "thumbnail_size": "420x420",
+    
+    # How often, and how far apart, thumbnails still being rendered ("Pending") are re-polled
+    # in the background
+    "thumbnail_pending_retries": 3,
+    "thumbnail_pending_delay": 1.0,
+    
+    # Maximum number of user IDs sent in one bulk user lookup
+    "users_batch_size": 100,
+    
+    # Maximum number of bulk user lookup requests running at the same time
+    "users_max_concurrency": 4
+}
+
+# Database configuration (pool settings can be overridden through the environment)
+DATABASE_CONFIG: Dict[str, Any] = {
+    # Connections opened when the bot starts and kept alive by the health check
+    "pool_min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+    
+    # Maximum number of pooled connections
+    "pool_max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+    
+    # Prepared statements cached per connection; set 0 behind a transaction-mode PgBouncer
+    "pool_statement_cache_size": int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100")),
+    
+    # How long a single query may run (in seconds)
+    "pool_command_timeout": float(os.getenv("DB_COMMAND_TIMEOUT", "60")),
+    
+    # How long opening a new connection may take (in seconds)
+    "pool_connect_timeout": float(os.getenv("DB_CONNECT_TIMEOUT", "10")),
+    
+    # Connections are closed and reopened after running this many queries
+    "pool_max_queries": int(os.getenv("DB_POOL_MAX_QUERIES", "50000")),
+    
+    # Connections idle for longer than this are closed (in seconds)
+    "pool_max_inactive_lifetime": float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300")),
+    
+    # How often the database is pinged through one pooled connection, reopening it if dead (in seconds)
+    "pool_health_check_interval": 30,
+    
+    # How long a health check waits for a free connection or a reply (in seconds)
+    "pool_health_check_timeout": 5,
+    
+    # How long shutdown waits for connections in use to be released (in seconds)
+    "pool_close_timeout": 10,
+    
+    # Maximum number of guilds whose settings and ticket roles are kept in memory
+    "guild_config_max_entries": 1000,
+    
+    # How long cached guild settings are trusted without a change notification (in seconds)
+    "guild_config_ttl": 300,
+    
+    # How long to wait before reconnecting the LISTEN connection after it drops (in seconds)
+    "listen_reconnect_delay": 5,
+    
+    # How often the otherwise idle LISTEN connection is checked (in seconds)
+    "listen_keepalive_interval": 60,
+    
+    # Audit rows (mod_actions) are written in batches of up to this many
+    "audit_batch_size": 100,
+    
+    # How long a queued audit row waits at most before being written (in seconds)
+    "audit_flush_interval": 1.0,
+    
+    # Oldest queued audit rows are dropped past this many (only while the database is unreachable)
+    "audit_max_queue": 10000,
+    
+    # Maximum number of tickets kept in memory for the persistent ticket buttons
+    "ticket_index_max_entries": 10000,
+    
+    # How long a ticket stays in memory after its last button click (in seconds)
+    "ticket_index_ttl": 3600,
+    
+    # How long a ticket opening keeps other instances from opening one for the same member
+    # (in seconds); only matters if the instance holding it dies mid-opening
+    "ticket_reservation_ttl": 120,
+    
+    # Queries taking longer than this (in seconds, including the wait for a connection)
+    # are logged with the cog function and command that ran them
+    "slow_query_threshold": 0.25,
+    
+    # Rows fetched per round trip by stream_query
+    "stream_prefetch": 500
 }
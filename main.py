@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, render_template_string
+from flask import Flask, Response, jsonify, render_template_string
 import os
 import threading
 import sys
@@ -116,6 +116,40 @@ def health():
     else:
         return jsonify({"status": "unhealthy", "error": bot_status["error"]}), 503
 
+@app.route('/metrics')
+def metrics():
+    """Runtime metrics for monitoring (Roblox API rate limits, circuit breakers, caches and query latency)"""
+    from utils.roblox_api import get_api_stats, get_cache_stats
+    from utils.database import get_pool_stats, get_query_stats, guild_config
+    from utils.audit_writer import mod_action_writer
+    from utils.ticket_repository import get_ticket_lock_stats, ticket_index
+    from utils.transcripts import transcript_archiver
+    from utils.ticket_reconciler import ticket_reconciler
+    
+    return jsonify({
+        "roblox": {
+            "api": get_api_stats(),
+            "caches": get_cache_stats()
+        },
+        "database": {
+            "pool": get_pool_stats(),
+            **get_query_stats(),
+            "guild_config": guild_config.stats(),
+            "mod_action_writer": mod_action_writer.stats(),
+            "ticket_locks": get_ticket_lock_stats(),
+            "ticket_index": ticket_index.stats(),
+            "ticket_reconciler": ticket_reconciler.stats()
+        },
+        "transcripts": transcript_archiver.stats()
+    })
+
+@app.route('/metrics/prometheus')
+def prometheus_metrics():
+    """Query latency histograms and pool wait in the Prometheus text format, for scraping"""
+    from utils.database import query_metrics
+    
+    return Response(query_metrics.prometheus(), mimetype="text/plain; version=0.0.4")
+
 def run_flask():
     """Run the Flask web server"""
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=False)
@@ -0,0 +1,184 @@
+"""
+Latency/throughput benchmark for utils/roblox_api.py.
+
+Drives N concurrent get_roblox_user / verify_roblox_user calls against the
+mock Roblox API (started in-process unless --mock-url is given) and reports
+p50/p95/p99 latency, calls per second and upstream requests per call.
+
+Usage:
+    python -m tools.benchmark_roblox_api --requests 2000 --concurrency 100 --operation user --fields basic
+    python -m tools.benchmark_roblox_api --operation verify --latency 0.1 --rate-limit-rate 0.05
+
+The client uses the rate limits from ROBLOX_API_CONFIG; pass --client-rps to
+lift them when measuring pooling, caching or batching rather than the limiter.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, List
+import aiohttp
+from config import ROBLOX_API_CONFIG, ROBLOX_CACHE_CONFIG
+from tools.mock_roblox_api import add_mock_arguments, mock_from_arguments, mock_verification_code, start_mock_server
+from utils import roblox_api
+from utils.database import close_pool
+from utils.roblox_api import RobloxClient, RobloxUnavailableError, close_client, set_client, get_roblox_user, verify_roblox_user
+
+# Setup logging
+logger = logging.getLogger('discord_bot.benchmark_roblox_api')
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(percent / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+async def mock_stats(session: aiohttp.ClientSession, mock_url: str, reset: bool = False) -> Dict[str, Any]:
+    """Read (or reset) the mock server's request counters"""
+    if reset:
+        async with session.post(f"{mock_url}/mock/reset") as response:
+            return await response.json()
+    async with session.get(f"{mock_url}/mock/stats") as response:
+        return await response.json()
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    runner = None
+    mock_url = args.mock_url
+    if mock_url is None:
+        runner = await start_mock_server(mock_from_arguments(args), port=args.port)
+        mock_url = f"http://127.0.0.1:{args.port}"
+    
+    roblox_api.ROBLOX_USERS_API_BASE = mock_url
+    roblox_api.ROBLOX_THUMBNAILS_API = mock_url
+    ROBLOX_CACHE_CONFIG["persist_profiles"] = args.use_db
+    
+    client_config = {}
+    if args.client_rps is not None:
+        client_config["rate_limit"] = {
+            "requests_per_second": args.client_rps,
+            "burst": args.client_burst or args.client_rps
+        }
+    client = RobloxClient(client_config)
+    await client.start()
+    set_client(client)
+    
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+    next_call = 0
+    
+    async def call(index: int):
+        user_id = index % args.distinct_users + 1
+        operation = args.operation
+        if operation == "mixed":
+            operation = "user" if index % 2 == 0 else "verify"
+        
+        started = time.perf_counter()
+        try:
+            if operation == "user":
+                result = await get_roblox_user(f"user{user_id}", fields=args.fields)
+                outcomes["ok" if result else "not_found"] += 1
+            else:
+                result = await verify_roblox_user(user_id, mock_verification_code(user_id))
+                outcomes["ok" if result else "not_verified"] += 1
+        except RobloxUnavailableError:
+            outcomes["unavailable"] += 1
+        except Exception as e:
+            logger.error(f"Benchmark call failed: {e}")
+            outcomes["error"] += 1
+        latencies.append(time.perf_counter() - started)
+    
+    async def worker():
+        nonlocal next_call
+        while next_call < args.requests:
+            index = next_call
+            next_call += 1
+            await call(index)
+    
+    try:
+        async with aiohttp.ClientSession() as stats_session:
+            await mock_stats(stats_session, mock_url, reset=True)
+            
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+            
+            upstream = await mock_stats(stats_session, mock_url)
+    finally:
+        await close_client()
+        await close_pool()
+        if runner is not None:
+            await runner.cleanup()
+    
+    latencies.sort()
+    by_route = {route: count for route, count in upstream["requests"].items() if not route.startswith("/mock/")}
+    upstream_requests = sum(by_route.values())
+    return {
+        "calls": len(latencies),
+        "concurrency": args.concurrency,
+        "operation": args.operation,
+        "elapsed_seconds": round(elapsed, 3),
+        "calls_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0
+        },
+        "outcomes": dict(outcomes),
+        "upstream": {
+            "requests": upstream_requests,
+            "requests_per_call": round(upstream_requests / len(latencies), 3) if latencies else 0.0,
+            "by_route": by_route,
+            "responses": upstream["responses"]
+        },
+        "client": client.stats(),
+        "caches": {
+            name: stats.get("hit_ratio", stats)
+            for name, stats in roblox_api.get_cache_stats().items()
+        }
+    }
+
+def print_report(report: Dict[str, Any]):
+    latency = report["latency_ms"]
+    upstream = report["upstream"]
+    print(f"{report['calls']} {report['operation']} calls, concurrency {report['concurrency']}, "
+          f"{report['elapsed_seconds']}s")
+    print(f"  throughput: {report['calls_per_second']} calls/s")
+    print(f"  latency:    p50 {latency['p50']}ms  p95 {latency['p95']}ms  "
+          f"p99 {latency['p99']}ms  max {latency['max']}ms")
+    print(f"  outcomes:   {report['outcomes']}")
+    print(f"  upstream:   {upstream['requests']} requests ({upstream['requests_per_call']} per call), "
+          f"responses {upstream['responses']}")
+    print(f"  by route:   {upstream['by_route']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Roblox API client against the mock server")
+    parser.add_argument("--requests", type=int, default=1000, help="Total number of calls to make")
+    parser.add_argument("--concurrency", type=int, default=50, help="Number of calls in flight at once")
+    parser.add_argument("--operation", choices=["user", "verify", "mixed"], default="user")
+    parser.add_argument("--fields", choices=["id", "basic", "full"], default="full",
+                        help="fields passed to get_roblox_user")
+    parser.add_argument("--distinct-users", type=int, default=1000,
+                        help="Calls cycle through this many users; fewer than --requests exercises the caches")
+    parser.add_argument("--mock-url", default=None, help="Use an already running mock server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the in-process mock server")
+    parser.add_argument("--client-rps", type=float, default=None,
+                        help=f"Override the client rate limit (default {ROBLOX_API_CONFIG['rate_limit']['requests_per_second']}/s)")
+    parser.add_argument("--client-burst", type=float, default=None, help="Override the client burst size")
+    parser.add_argument("--use-db", action="store_true", help="Keep the roblox_profiles database tier enabled")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    report = asyncio.run(run_benchmark(args))
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Check that the hot queries are served by an index.
+
+Brings the database at DATABASE_URL up to the latest schema, then EXPLAINs
+each query below with sequential scans disabled. Postgres still picks a
+sequential scan when no index can answer the query, so any "Seq Scan" in a
+plan means an index is missing. Exits with status 1 if one is found.
+
+Point it at a local or throwaway database, never production:
+    DATABASE_URL=postgresql://localhost/bot_dev python -m tools.check_query_plans
+"""
+import asyncio
+import json
+import logging
+import sys
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+from utils import queries
+from utils.database import close_pool, get_pool, run_migrations
+from utils.queries import Query
+
+# Setup logging
+logger = logging.getLogger('discord_bot.check_query_plans')
+
+# Queries that run on every button click or command, with sample arguments
+HOT_QUERIES: List[Tuple[Query, Tuple[Any, ...]]] = [
+    (queries.OPEN_TICKET_CHANNEL, (1, 2)),
+    (queries.TICKET_OPEN_CONTEXT, (1, 2, uuid.UUID(int=0), 120.0)),
+    (queries.RESERVE_TICKET_OPENING, (1, 2, uuid.UUID(int=0), 120.0)),
+    (queries.RELEASE_TICKET_RESERVATION, (1, 2, uuid.UUID(int=0))),
+    (queries.CLOSE_STALE_TICKET, (3,)),
+    (queries.CLOSE_TICKET, (None, 3)),
+    (queries.TICKET_BY_ID, (3,)),
+    (queries.TICKET_BY_CHANNEL, (3,)),
+    (queries.OPEN_TICKETS_BEFORE, (datetime.max,)),
+    (queries.CLOSE_TICKETS, (None, [3, 4])),
+    (queries.GUILD_CONFIG, (1,)),
+    (queries.WARN_COUNT, (1, 2)),
+    (queries.MOD_ACTIONS_PAGE, (1, 2, datetime.max, 0, None, None, 11)),
+    (queries.MOD_ACTIONS_PAGE, (1, 2, datetime(2024, 1, 1), 500, "warn", 3, 11)),
+    (queries.VERIFIED_USER_BY_DISCORD_ID, (1,)),
+    (queries.DISCORD_ID_BY_ROBLOX_ID, (1,)),
+    (
+        Query(
+            "stored_roblox_profile_by_username",
+            "SELECT roblox_id, username FROM roblox_profiles WHERE LOWER(username) = $1"
+        ),
+        ("builderman",)
+    )
+]
+
+def find_seq_scans(plan: Dict[str, Any]) -> List[str]:
+    """Get the tables read with a sequential scan anywhere in a plan tree"""
+    tables = []
+    if plan.get("Node Type") == "Seq Scan":
+        tables.append(plan.get("Relation Name", "?"))
+    for child in plan.get("Plans", []):
+        tables.extend(find_seq_scans(child))
+    return tables
+
+async def check_query_plans() -> bool:
+    """EXPLAIN every hot query and report the ones that need a sequential scan"""
+    await run_migrations()
+    pool = await get_pool()
+    ok = True
+    
+    try:
+        async with pool.acquire() as conn:
+            # Plain EXPLAIN never runs the query; the transaction only scopes SET LOCAL
+            async with conn.transaction():
+                await conn.execute("SET LOCAL enable_seqscan = off")
+                for query, args in HOT_QUERIES:
+                    result = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query.sql}", *args)
+                    plan = json.loads(result)[0]["Plan"]
+                    seq_scans = find_seq_scans(plan)
+                    if seq_scans:
+                        ok = False
+                        print(f"FAIL  {query.name}: sequential scan on {', '.join(seq_scans)}")
+                    else:
+                        print(f"ok    {query.name}")
+    finally:
+        await close_pool()
+    
+    return ok
+
+def main():
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    ok = asyncio.run(check_query_plans())
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
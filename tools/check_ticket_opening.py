@@ -0,0 +1,127 @@
+"""
+Check that concurrent ticket openings across bot instances create one channel.
+
+Starts --instances worker processes, each standing in for a bot instance, and
+has every one of them click "Open Ticket" --clicks times for the same member
+at the same moment. Each click follows the cogs' opening path through
+utils.ticket_repository, with the Discord channel create replaced by a
+counter and a --create-delay sleep. Passes if exactly one channel was
+"created" and exactly one ticket is open; a click that loses the race to
+another instance must reply without creating a channel. Exits with status 1
+otherwise.
+
+Point it at a local or throwaway database, never production:
+    DATABASE_URL=postgresql://localhost/bot_dev python -m tools.check_ticket_opening
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict
+from utils.database import close_pool, execute_query, fetchval, run_migrations
+from utils.ticket_repository import ticket_opening
+
+# Setup logging
+logger = logging.getLogger('discord_bot.check_ticket_opening')
+
+# Far below Discord's snowflake IDs, so no real guild's tickets are touched
+TEST_GUILD_ID = 1
+
+async def click(args: argparse.Namespace) -> str:
+    """One "Open Ticket" click, as cogs.tickets handles it"""
+    async with ticket_opening(args.guild_id, args.user_id) as opening:
+        if opening.context.open_channel_id:
+            return "existing"
+        if not opening.reserved:
+            return "pending"
+        
+        # guild.create_text_channel
+        await asyncio.sleep(args.create_delay)
+        channel_id = random.getrandbits(62)
+        if await opening.record(channel_id, 'general') is not None:
+            # The cog deletes the channel it just created
+            return "duplicate"
+        return "created"
+
+async def run_worker(args: argparse.Namespace) -> Dict[str, Any]:
+    """Click from this process once every instance is ready"""
+    try:
+        # Connect first, so every instance clicks at the same moment
+        await fetchval("SELECT 1")
+        await asyncio.sleep(max(0.0, args.start_at - time.time()))
+        outcomes = await asyncio.gather(*(click(args) for _ in range(args.clicks)), return_exceptions=True)
+    finally:
+        await close_pool()
+    return dict(Counter(o if isinstance(o, str) else f"error: {o}" for o in outcomes))
+
+async def run_check(args: argparse.Namespace) -> bool:
+    """Run the worker processes and check how many channels they created"""
+    await run_migrations()
+    await execute_query("DELETE FROM tickets WHERE guild_id = $1", args.guild_id)
+    await execute_query("DELETE FROM ticket_reservations WHERE guild_id = $1", args.guild_id)
+    
+    start_at = time.time() + args.startup_time
+    workers = [
+        await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "tools.check_ticket_opening", "--worker",
+            "--guild-id", str(args.guild_id), "--user-id", str(args.user_id),
+            "--clicks", str(args.clicks), "--create-delay", str(args.create_delay),
+            "--start-at", str(start_at),
+            stdout=asyncio.subprocess.PIPE
+        )
+        for _ in range(args.instances)
+    ]
+    
+    outcomes = Counter()
+    try:
+        for index, worker in enumerate(workers):
+            stdout, _ = await worker.communicate()
+            if worker.returncode != 0:
+                print(f"FAIL  instance {index} exited with status {worker.returncode}")
+                return False
+            instance_outcomes = json.loads(stdout)
+            print(f"      instance {index}: {instance_outcomes}")
+            outcomes.update(instance_outcomes)
+        
+        open_tickets = await fetchval(
+            "SELECT COUNT(*) FROM tickets WHERE guild_id = $1 AND user_id = $2 AND status = 'open'",
+            args.guild_id, args.user_id
+        )
+    finally:
+        await execute_query("DELETE FROM tickets WHERE guild_id = $1", args.guild_id)
+        await execute_query("DELETE FROM ticket_reservations WHERE guild_id = $1", args.guild_id)
+        await close_pool()
+    
+    channels = outcomes["created"] + outcomes["duplicate"]
+    ok = channels == 1 and open_tickets == 1
+    print(f"{'ok  ' if ok else 'FAIL'}  {channels} channel(s) created, {open_tickets} open ticket(s), "
+          f"{sum(outcomes.values())} clicks: {dict(outcomes)}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that racing ticket openings across instances create one channel")
+    parser.add_argument("--instances", type=int, default=3, help="Number of bot instances to simulate")
+    parser.add_argument("--clicks", type=int, default=10, help="Clicks per instance, all at once")
+    parser.add_argument("--create-delay", type=float, default=0.5,
+                        help="How long creating the channel takes (in seconds)")
+    parser.add_argument("--startup-time", type=float, default=3.0,
+                        help="How long the instances get to start before clicking (in seconds)")
+    parser.add_argument("--guild-id", type=int, default=TEST_GUILD_ID)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.worker:
+        print(json.dumps(asyncio.run(run_worker(args))))
+        return
+    ok = asyncio.run(run_check(args))
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
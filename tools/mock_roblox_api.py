@@ -0,0 +1,252 @@
+"""
+Local stand-in for the Roblox endpoints used by utils/roblox_api.py.
+
+Serves the users, usernames and thumbnails routes with generated users
+("user1" has ID 1, "user2" has ID 2, ...) and can inject latency, server
+errors and 429 responses so the client can be exercised offline.
+
+Usage:
+    python -m tools.mock_roblox_api --port 8765 --latency 0.08 --error-rate 0.02
+
+Then point the bot or the benchmark at it:
+    ROBLOX_USERS_API_BASE=http://127.0.0.1:8765 ROBLOX_THUMBNAILS_API=http://127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+
+# Setup logging
+logger = logging.getLogger('discord_bot.mock_roblox_api')
+
+USERNAME_PREFIX = "user"
+
+def mock_verification_code(user_id: int) -> str:
+    """The verification code every mock user has in their description"""
+    return f"MOCK-{user_id}"
+
+class MockRobloxAPI:
+    """
+    Fake Roblox API with configurable latency and fault injection.
+    
+    Faults are decided per request: first the hard rate limit (if set), then
+    rate_limit_rate (random 429s), then error_rate (random 500s).
+    """
+    
+    def __init__(
+        self,
+        users: int = 10000,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        max_requests_per_second: Optional[float] = None,
+        pending_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.users = users
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.max_requests_per_second = max_requests_per_second
+        self.pending_rate = pending_rate
+        self._random = random.Random(seed)
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self.requests: Counter = Counter()
+        self.responses: Counter = Counter()
+    
+    def _user_id(self, username: str) -> Optional[int]:
+        """Map "userN" to N if that user exists"""
+        username = username.lower()
+        if not username.startswith(USERNAME_PREFIX):
+            return None
+        try:
+            user_id = int(username[len(USERNAME_PREFIX):])
+        except ValueError:
+            return None
+        return user_id if 1 <= user_id <= self.users else None
+    
+    def _basic(self, user_id: int) -> Dict[str, Any]:
+        return {
+            "id": user_id,
+            "name": f"{USERNAME_PREFIX}{user_id}",
+            "displayName": f"User {user_id}",
+            "hasVerifiedBadge": False
+        }
+    
+    def _rate_limited(self) -> bool:
+        """Fixed one-second window limiter, like the real API's per-IP limit"""
+        if self.max_requests_per_second is None:
+            return False
+        
+        now = time.monotonic()
+        if now - self._window_start >= 1:
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+        return self._window_count > self.max_requests_per_second
+    
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        """Add latency and injected faults in front of every route"""
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        self.requests[route] += 1
+        
+        if request.path.startswith("/mock/"):
+            return await handler(request)
+        
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
+        if self._rate_limited() or self._random.random() < self.rate_limit_rate:
+            self.responses[429] += 1
+            return web.json_response(
+                {"errors": [{"code": 0, "message": "Too many requests"}]},
+                status=429,
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        
+        if self._random.random() < self.error_rate:
+            self.responses[500] += 1
+            return web.json_response({"errors": [{"code": 0, "message": "InternalServerError"}]}, status=500)
+        
+        response = await handler(request)
+        self.responses[response.status] += 1
+        return response
+    
+    async def usernames_users(self, request: web.Request) -> web.Response:
+        """POST /v1/usernames/users"""
+        body = await request.json()
+        data = []
+        for username in body.get("usernames", []):
+            user_id = self._user_id(username)
+            if user_id is not None:
+                data.append({"requestedUsername": username, **self._basic(user_id)})
+        return web.json_response({"data": data})
+    
+    async def user_details(self, request: web.Request) -> web.Response:
+        """GET /v1/users/{id}"""
+        try:
+            user_id = int(request.match_info["user_id"])
+        except ValueError:
+            user_id = 0
+        if not 1 <= user_id <= self.users:
+            return web.json_response({"errors": [{"code": 3, "message": "The user id is invalid."}]}, status=404)
+        
+        return web.json_response({
+            **self._basic(user_id),
+            "description": f"Mock profile. Code: {mock_verification_code(user_id)}",
+            "created": "2015-03-02T19:45:23.51Z",
+            "isBanned": False,
+            "externalAppDisplayName": None
+        })
+    
+    async def users_by_ids(self, request: web.Request) -> web.Response:
+        """POST /v1/users"""
+        body = await request.json()
+        user_ids: List[int] = body.get("userIds", [])
+        if len(user_ids) > 100:
+            return web.json_response({"errors": [{"code": 2, "message": "Too many ids."}]}, status=400)
+        
+        data = [self._basic(user_id) for user_id in user_ids if 1 <= user_id <= self.users]
+        return web.json_response({"data": data})
+    
+    async def avatar_headshot(self, request: web.Request) -> web.Response:
+        """GET /v1/users/avatar-headshot"""
+        size = request.query.get("size", "420x420")
+        data = []
+        for value in request.query.get("userIds", "").split(","):
+            if not value:
+                continue
+            user_id = int(value)
+            if not 1 <= user_id <= self.users:
+                data.append({"targetId": user_id, "state": "Error", "imageUrl": None, "version": ""})
+            elif self._random.random() < self.pending_rate:
+                data.append({"targetId": user_id, "state": "Pending", "imageUrl": None, "version": ""})
+            else:
+                data.append({
+                    "targetId": user_id,
+                    "state": "Completed",
+                    "imageUrl": f"https://tr.rbxcdn.com/mock/{user_id}/{size}/AvatarHeadshot/Png",
+                    "version": "TN3"
+                })
+        return web.json_response({"data": data})
+    
+    async def stats(self, request: web.Request) -> web.Response:
+        """GET /mock/stats - request counts per route and response counts per status"""
+        return web.json_response({
+            "requests": dict(self.requests),
+            "responses": {str(status): count for status, count in self.responses.items()}
+        })
+    
+    async def reset(self, request: web.Request) -> web.Response:
+        """POST /mock/reset - clear the counters between benchmark runs"""
+        self.requests.clear()
+        self.responses.clear()
+        return web.json_response({"ok": True})
+    
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_post("/v1/usernames/users", self.usernames_users)
+        # Registered before /v1/users/{user_id} so it isn't taken for a user ID
+        app.router.add_get("/v1/users/avatar-headshot", self.avatar_headshot)
+        app.router.add_get("/v1/users/{user_id}", self.user_details)
+        app.router.add_post("/v1/users", self.users_by_ids)
+        app.router.add_get("/mock/stats", self.stats)
+        app.router.add_post("/mock/reset", self.reset)
+        return app
+
+async def start_mock_server(api: MockRobloxAPI, host: str = "127.0.0.1", port: int = 8765) -> web.AppRunner:
+    """Start the mock server in the running event loop; call cleanup() on the result to stop it"""
+    runner = web.AppRunner(api.create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Mock Roblox API listening on http://{host}:{port}")
+    return runner
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    """Add the fault injection options shared with the benchmark"""
+    parser.add_argument("--users", type=int, default=10000, help="Number of generated users (user1..userN)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Base response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Extra random latency of up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After sent with injected 429s (seconds)")
+    parser.add_argument("--max-rps", type=float, default=None, help="Answer requests over this rate with a 429")
+    parser.add_argument("--pending-rate", type=float, default=0.0, help="Fraction of thumbnails returned as Pending")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the fault injection")
+
+def mock_from_arguments(args: argparse.Namespace) -> MockRobloxAPI:
+    return MockRobloxAPI(
+        users=args.users,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        max_requests_per_second=args.max_rps,
+        pending_rate=args.pending_rate,
+        seed=args.seed
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the Roblox API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    web.run_app(mock_from_arguments(args).create_app(), host=args.host, port=args.port, access_log=None)
+
+if __name__ == "__main__":
+    main()
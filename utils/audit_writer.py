@@ -0,0 +1,251 @@
+import asyncio
+import datetime
+import logging
+import asyncpg
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from config import DATABASE_CONFIG
+from utils.database import run_timed
+from utils.queries import Query
+
+# Setup logging
+logger = logging.getLogger('discord_bot.audit_writer')
+
+# A batch failing with one of these has a record the database will never accept (a bad
+# value, a violated constraint); anything else, such as a lost connection, is retried
+BAD_RECORD_ERRORS = (
+    asyncpg.DataError,
+    asyncpg.IntegrityConstraintViolationError,
+    # Values asyncpg itself can't encode for their column
+    ValueError,
+    TypeError,
+    OverflowError
+)
+
+class AuditWriter:
+    """
+    Write-behind queue for append-only audit rows.
+    
+    Records are queued in memory and written in batches with COPY, either when
+    batch_size records are waiting or every flush_interval seconds. Callers that
+    need to read their own write straight away pass durable=True, which flushes
+    immediately and waits for the batch to be committed.
+    
+    If a flush fails the records stay queued and are retried on the next one;
+    past max_queue the oldest records are dropped (and logged) so a database
+    outage can't exhaust memory. Durable records are not retried: their
+    callers get the error instead. A batch the database rejects for its data
+    is written again one record at a time, and the bad records are dropped
+    (and logged) so they can't hold up the rest.
+    """
+    
+    def __init__(
+        self,
+        table: str,
+        columns: Sequence[str],
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000
+    ):
+        self.table = table
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        # Each record with the future of a durable caller waiting for it (or None)
+        self._queue: List[Tuple[Tuple[Any, ...], Optional[asyncio.Future]]] = []
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.records_written = 0
+        self.batches_written = 0
+        self.records_dropped = 0
+        self.failed_flushes = 0
+    
+    async def write(self, record: Tuple[Any, ...], durable: bool = False):
+        """
+        Queue a record
+        
+        Args:
+            record: Values in the same order as columns
+            durable: Wait until the record is committed, flushing right away
+        
+        Raises:
+            Exception: With durable=True, whatever the flush failed with. The
+                record is dropped rather than retried, so the caller can safely
+                try again without writing it twice.
+        """
+        future = asyncio.get_running_loop().create_future() if durable else None
+        self._queue.append((record, future))
+        
+        if len(self._queue) > self.max_queue:
+            dropped = len(self._queue) - self.max_queue
+            for _, waiter in self._queue[:dropped]:
+                if waiter is not None and not waiter.done():
+                    waiter.set_exception(RuntimeError("Audit queue overflowed"))
+            del self._queue[:dropped]
+            self.records_dropped += dropped
+            logger.error(f"Audit queue for {self.table} is full, dropped {dropped} record(s)")
+        
+        if durable or len(self._queue) >= self.batch_size:
+            self._wake.set()
+        
+        if future is not None:
+            if self._task is None or self._task.done():
+                # Not started (e.g. a script), so flush inline
+                await self.flush()
+            await future
+    
+    async def flush(self):
+        """Write everything queued so far in one COPY"""
+        async with self._flush_lock:
+            if not self._queue:
+                return
+            
+            batch, self._queue = self._queue, []
+            try:
+                await run_timed(
+                    Query(f"copy_{self.table}", f"COPY {self.table}"),
+                    (),
+                    lambda conn: conn.copy_records_to_table(
+                        self.table,
+                        records=[record for record, _ in batch],
+                        columns=self.columns
+                    ),
+                    "copy"
+                )
+            except BAD_RECORD_ERRORS as e:
+                # Retrying the batch would fail the same way and hold up everything behind it
+                logger.warning(f"{self.table} batch of {len(batch)} record(s) was rejected, writing them one at a time: {e}")
+                await self._write_each(batch)
+                return
+            except Exception as e:
+                self._failed(batch, e)
+                return
+            except BaseException:
+                self._cancelled(batch)
+                raise
+            
+            self.records_written += len(batch)
+            self.batches_written += 1
+            for _, waiter in batch:
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(None)
+    
+    async def _write_each(self, batch: List[Tuple[Tuple[Any, ...], Optional[asyncio.Future]]]):
+        """Write a rejected batch record by record, dropping (and logging) the bad ones"""
+        done = 0
+        
+        async def copy_each(conn):
+            nonlocal done
+            while done < len(batch):
+                record, waiter = batch[done]
+                try:
+                    await conn.copy_records_to_table(self.table, records=[record], columns=self.columns)
+                except BAD_RECORD_ERRORS as e:
+                    self.records_dropped += 1
+                    logger.error(f"Dropped {self.table} record the database rejected: {record!r}: {e}")
+                    if waiter is not None and not waiter.done():
+                        waiter.set_exception(e)
+                else:
+                    self.records_written += 1
+                    if waiter is not None and not waiter.done():
+                        waiter.set_result(None)
+                done += 1
+        
+        try:
+            await run_timed(Query(f"copy_{self.table}_each", f"COPY {self.table}"), (), copy_each, "copy")
+        except Exception as e:
+            self._failed(batch[done:], e)
+        except BaseException:
+            self._cancelled(batch[done:])
+            raise
+    
+    def _failed(self, batch: List[Tuple[Tuple[Any, ...], Optional[asyncio.Future]]], error: Exception):
+        """Queue the records of a batch that couldn't be written to try again, failing durable writers"""
+        retried = self._requeue(batch)
+        logger.error(f"Error writing {len(batch)} {self.table} record(s), will retry {retried}: {error}")
+        self.failed_flushes += 1
+        for _, waiter in batch:
+            if waiter is not None and not waiter.done():
+                waiter.set_exception(error)
+    
+    def _cancelled(self, batch: List[Tuple[Tuple[Any, ...], Optional[asyncio.Future]]]):
+        """Cancelled mid-COPY: keep the records instead of losing them with the task"""
+        self._requeue(batch)
+        for _, waiter in batch:
+            if waiter is not None and not waiter.done():
+                waiter.cancel()
+    
+    def _requeue(self, batch: List[Tuple[Tuple[Any, ...], Optional[asyncio.Future]]]) -> int:
+        """
+        Put the records of a failed batch back in front of anything queued meanwhile
+        
+        Durable records are left out: their caller gets the error and decides
+        whether to retry, so a retried write can't land twice.
+        """
+        retry = [(record, None) for record, waiter in batch if waiter is None]
+        self._queue = retry + self._queue
+        return len(retry)
+    
+    def start(self):
+        """Start flushing in the background"""
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the background flusher and write whatever is still queued"""
+        if self._task is not None:
+            # Let a flush in progress finish rather than cancelling it mid-COPY
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        
+        await self.flush()
+        if self._queue:
+            logger.error(f"Shut down with {len(self._queue)} unwritten {self.table} record(s)")
+    
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get queue and write counters for monitoring"""
+        return {
+            "queued": len(self._queue),
+            "records_written": self.records_written,
+            "batches_written": self.batches_written,
+            "records_dropped": self.records_dropped,
+            "failed_flushes": self.failed_flushes
+        }
+
+# Moderation actions, written behind the commands that take them
+mod_action_writer = AuditWriter(
+    "mod_actions",
+    ["guild_id", "user_id", "target_id", "action_type", "reason", "timestamp", "duration"],
+    batch_size=DATABASE_CONFIG["audit_batch_size"],
+    flush_interval=DATABASE_CONFIG["audit_flush_interval"],
+    max_queue=DATABASE_CONFIG["audit_max_queue"]
+)
+
+async def log_mod_action(
+    guild_id: int,
+    user_id: int,
+    target_id: int,
+    action_type: str,
+    reason: Optional[str],
+    duration: Optional[int] = None,
+    durable: bool = False
+):
+    """Record a moderation action; pass durable=True to read it back straight away"""
+    await mod_action_writer.write(
+        (guild_id, user_id, target_id, action_type, reason, datetime.datetime.now(), duration),
+        durable=durable
+    )
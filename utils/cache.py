@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Returned by TTLCache.get on a miss, so that a cached None ("not found") can be told apart
+MISSING = object()
+
+class TTLCache:
+    """
+    Bounded in-memory cache with per-entry expiry and LRU eviction.
+    
+    Negative results (lookups that found nothing) are stored as None with
+    their own, usually shorter, TTL so repeated misses don't hit the API.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl if negative_ttl is not None else ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Get a cached value, or default if it is missing or expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entries if full"""
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+    
+    def set_negative(self, key: Hashable):
+        """Remember that a lookup for this key found nothing"""
+        self.set(key, None, self.negative_ttl)
+    
+    def invalidate(self, key: Hashable):
+        """Remove a single entry"""
+        self._data.pop(key, None)
+    
+    def clear(self):
+        """Remove all entries"""
+        self._data.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,176 @@
+import asyncio
+import contextlib
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+class MicroBatcher:
+    """
+    Gathers single-key lookups that arrive within a short window and resolves
+    them with one batched call.
+    
+    The batch function receives a list of unique keys and returns a dict of
+    results; keys missing from that dict resolve to None. If the batch call
+    raises, every caller waiting on that batch gets the exception.
+    """
+    
+    def __init__(
+        self,
+        fetch_batch: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        window: float = 0.01,
+        max_batch_size: int = 100
+    ):
+        self.fetch_batch = fetch_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[Hashable, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches_sent = 0
+        self.keys_requested = 0
+    
+    async def load(self, key: Hashable) -> Any:
+        """Queue a key for the next batch and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append(future)
+        self.keys_requested += 1
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        """Send everything gathered so far as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        if not self._pending:
+            return
+        
+        batch, self._pending = self._pending, {}
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, batch: Dict[Hashable, List[asyncio.Future]]):
+        """Run the batch function and hand each result to its waiters"""
+        # Skip keys whose callers have all gone away in the meantime
+        keys = [key for key, futures in batch.items() if not all(f.done() for f in futures)]
+        if not keys:
+            return
+        
+        self.batches_sent += 1
+        try:
+            results = await self.fetch_batch(keys)
+        except asyncio.CancelledError:
+            for futures in batch.values():
+                for future in futures:
+                    future.cancel()
+            raise
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        
+        for key, futures in batch.items():
+            value = results.get(key)
+            for future in futures:
+                if not future.done():
+                    future.set_result(value)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get batching counters for monitoring"""
+        return {
+            "batches_sent": self.batches_sent,
+            "keys_requested": self.keys_requested,
+            "pending": len(self._pending)
+        }
+
+class SingleFlight:
+    """
+    Shares one in-flight call among concurrent callers asking for the same key.
+    
+    The call runs as its own task, so a caller that is cancelled stops waiting
+    without cancelling the call for everyone else. If the call fails or is
+    cancelled itself, every waiter receives that error.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls_started = 0
+        self.calls_shared = 0
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for this key, or join the call already running for it"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+            self.calls_started += 1
+        else:
+            self.calls_shared += 1
+        
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        """Forget a finished call so the next caller starts a fresh one"""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        
+        # Mark the error as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get deduplication counters for monitoring"""
+        return {
+            "in_flight": len(self._calls),
+            "calls_started": self.calls_started,
+            "calls_shared": self.calls_shared
+        }
+
+class KeyedLock:
+    """
+    One asyncio.Lock per key, created on first use and dropped once nobody
+    holds or waits for it, so the number of keys seen doesn't grow memory.
+    """
+    
+    def __init__(self):
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._users: Dict[Hashable, int] = {}
+        self.acquisitions = 0
+        self.contended = 0
+    
+    @contextlib.asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        """Hold the lock for this key for the duration of the block"""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._users[key] = self._users.get(key, 0) + 1
+        self.acquisitions += 1
+        if lock.locked():
+            self.contended += 1
+        
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get lock counters for monitoring"""
+        return {
+            "keys": len(self._locks),
+            "acquisitions": self.acquisitions,
+            "contended": self.contended
+        }
@@ -1,9 +1,18 @@
 import os
+import re
+import time
 import asyncio
+import functools
 import logging
 import asyncpg
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Union, Tuple
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Union, Tuple
+from config import DATABASE_CONFIG
+from utils.cache import TTLCache, MISSING
+from utils.coalesce import SingleFlight
+from utils.metrics import QueryMetrics
+from utils.queries import Query, GUILD_CONFIG
 
 # Setup logging
 logger = logging.getLogger('discord_bot.database')
@@ -25,16 +34,38 @@ else:
 # Pool for database connections
 _pool = None
 
+# Set by close_pool(), so nothing recreates the pool during shutdown; open_pool() clears it
+_pool_closed = False
+
+# Task pinging the pool's connections (see open_pool)
+_health_task: Optional[asyncio.Task] = None
+_health_checks = {"checks": 0, "failed_checks": 0, "dead_connections": 0, "skipped_busy": 0}
+
+# Latency, rows and errors of every query run through the helpers below
+query_metrics = QueryMetrics()
+
 async def get_pool() -> asyncpg.Pool:
-    """Get or create the database connection pool"""
+    """
+    Get or create the database connection pool
+    
+    Raises:
+        RuntimeError: The pool was closed with close_pool() and not reopened
+    """
     global _pool
+    if _pool_closed:
+        raise RuntimeError("Database pool has been closed")
     if _pool is None:
         try:
+            # Creating the pool opens min_size connections straight away
             _pool = await asyncpg.create_pool(
                 dsn=dsn,
-                min_size=1,
-                max_size=10,
-                command_timeout=60
+                min_size=DATABASE_CONFIG["pool_min_size"],
+                max_size=DATABASE_CONFIG["pool_max_size"],
+                statement_cache_size=DATABASE_CONFIG["pool_statement_cache_size"],
+                command_timeout=DATABASE_CONFIG["pool_command_timeout"],
+                timeout=DATABASE_CONFIG["pool_connect_timeout"],
+                max_queries=DATABASE_CONFIG["pool_max_queries"],
+                max_inactive_connection_lifetime=DATABASE_CONFIG["pool_max_inactive_lifetime"]
             )
             logger.info("Database connection pool created successfully")
         except Exception as e:
@@ -42,35 +73,298 @@ async def get_pool() -> asyncpg.Pool:
             raise
     return _pool
 
-async def execute_query(query: str, *args) -> str:
-    """Execute a database query with parameters"""
+async def check_pool() -> bool:
+    """
+    Ping the database through one pooled connection, reopening it if it doesn't answer
+    
+    Only one connection is borrowed, so the check never competes with real
+    traffic for more than that, and none when every connection is already in
+    use. Idle connections past pool_max_inactive_lifetime are closed by
+    asyncpg, and the pool reopens up to min_size as it's used.
+    
+    Returns:
+        bool: False if the database couldn't be reached or the connection was dead
+    """
+    _health_checks["checks"] += 1
+    try:
+        pool = await get_pool()
+    except Exception:
+        _health_checks["failed_checks"] += 1
+        return False
+    
+    # Every connection open and in use: they're evidently alive, and real traffic needs them
+    if pool.get_idle_size() == 0 and pool.get_size() >= pool.get_max_size():
+        _health_checks["skipped_busy"] += 1
+        return True
+    
+    timeout = DATABASE_CONFIG["pool_health_check_timeout"]
+    healthy = True
+    try:
+        conn = await pool.acquire(timeout=timeout)
+    except asyncio.TimeoutError:
+        _health_checks["skipped_busy"] += 1
+        return True
+    except Exception as e:
+        _health_checks["failed_checks"] += 1
+        logger.error(f"Database health check failed: {e}")
+        return False
+    
+    try:
+        await conn.fetchval("SELECT 1", timeout=timeout)
+    except Exception as e:
+        healthy = False
+        _health_checks["dead_connections"] += 1
+        logger.warning(f"Closing unresponsive database connection: {e!r}")
+        # The pool opens a new connection in its place on the next acquire
+        conn.terminate()
+    finally:
+        await pool.release(conn)
+    
+    if not healthy:
+        _health_checks["failed_checks"] += 1
+    return healthy
+
+async def _health_check_loop():
+    while True:
+        await asyncio.sleep(DATABASE_CONFIG["pool_health_check_interval"])
+        await check_pool()
+
+async def open_pool():
+    """Create the pool with min_size connections open and start the periodic health check"""
+    global _health_task, _pool_closed
+    _pool_closed = False
     pool = await get_pool()
+    await check_pool()
+    if _health_task is None or _health_task.done():
+        _health_task = asyncio.create_task(_health_check_loop())
+    logger.info(f"Database pool ready with {pool.get_size()} connection(s)")
+
+async def close_pool():
+    """
+    Stop the health check and close the pool once connections in use are released
+    
+    Until open_pool() is called again, get_pool() raises rather than opening a new pool.
+    """
+    global _pool, _health_task, _pool_closed
+    _pool_closed = True
+    if _health_task is not None:
+        _health_task.cancel()
+        try:
+            await _health_task
+        except asyncio.CancelledError:
+            pass
+        _health_task = None
+    
+    if _pool is None:
+        return
+    pool, _pool = _pool, None
     try:
-        async with pool.acquire() as conn:
-            return await conn.execute(query, *args)
+        await asyncio.wait_for(pool.close(), DATABASE_CONFIG["pool_close_timeout"])
+        logger.info("Database connection pool closed")
+    except asyncio.TimeoutError:
+        logger.warning("Timed out waiting for database connections to be released, terminating them")
+        pool.terminate()
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Get pool size and health check counters for monitoring"""
+    stats = {
+        "size": _pool.get_size() if _pool is not None else 0,
+        "idle": _pool.get_idle_size() if _pool is not None else 0,
+        "min_size": DATABASE_CONFIG["pool_min_size"],
+        "max_size": DATABASE_CONFIG["pool_max_size"]
+    }
+    stats.update(_health_checks)
+    return stats
+
+def _sql(query: Union[Query, str]) -> str:
+    return query.sql if isinstance(query, Query) else query
+
+@functools.lru_cache(maxsize=256)
+def _normalize_sql(sql: str) -> str:
+    # Literals are replaced so statements built with f-strings share one name
+    sql = re.sub(r"'(?:[^']|'')*'", "?", " ".join(sql.split()))
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    return sql if len(sql) <= 80 else sql[:77] + "..."
+
+def query_name(query: Union[Query, str]) -> str:
+    """Name a query is reported under: its registry name, or its SQL normalized"""
+    return query.name if isinstance(query, Query) else _normalize_sql(query)
+
+def _log_query_error(kind: str, query: Union[Query, str], args: Tuple[Any, ...], error: Exception):
+    logger.error(f"Database {kind} error: {error}")
+    logger.error(f"Query: {query.name if isinstance(query, Query) else query}")
+    logger.error(f"Args: {args}")
+
+def _row_count(result: Any) -> int:
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, str):
+        # Command status such as "UPDATE 3" or "INSERT 0 1"
+        count = result.rsplit(" ", 1)[-1]
+        return int(count) if count.isdigit() else 0
+    return 0 if result is None else 1
+
+# The command or component the current task is running for, named in the slow query log.
+# Set when an interaction starts; tasks it spawns (background writes, say) inherit it.
+_query_source: ContextVar[Optional[str]] = ContextVar("query_source", default=None)
+
+def set_query_source(interaction: Any):
+    """Attribute the queries run from here on (in this task and the tasks it starts) to an interaction"""
+    app_command = getattr(interaction, "command", None)
+    data = getattr(interaction, "data", None) or {}
+    if app_command is not None:
+        _query_source.set(f"/{app_command.qualified_name}")
+    elif data.get("custom_id"):
+        _query_source.set(f"component {data['custom_id']}")
+
+def _record_query(
+    query: Union[Query, str],
+    acquire_wait: Optional[float],
+    duration: float,
+    rows: int,
+    slow_log: bool = True
+):
+    # acquire_wait is None for queries on a connection the caller already held
+    name = query_name(query)
+    query_metrics.record(name, acquire_wait * 1000 if acquire_wait is not None else None, duration * 1000, rows)
+    acquire_wait = acquire_wait or 0.0
+    if slow_log and acquire_wait + duration >= DATABASE_CONFIG["slow_query_threshold"]:
+        query_metrics.slow_queries += 1
+        logger.warning(
+            f"Slow query {name}: {duration * 1000:.1f} ms "
+            f"(+{acquire_wait * 1000:.1f} ms waiting for a connection), "
+            f"{rows} row(s), from {_query_source.get() or 'outside a command'}"
+        )
+
+async def run_timed(
+    query: Union[Query, str],
+    args: Tuple[Any, ...],
+    call: Callable[[asyncpg.Connection], Awaitable[Any]],
+    kind: str = "query",
+    conn: Optional[asyncpg.Connection] = None
+) -> Any:
+    """
+    Run call on a pooled connection and record it in query_metrics
+    
+    The query helpers below all go through here; use it directly for
+    connection methods they don't cover (COPY, for instance).
+    
+    Args:
+        query: The Query (or SQL) being run, used to name the sample
+        args: Query arguments, only used when logging an error
+        call: Coroutine function taking the connection
+        kind: What to call the query in error logs
+        conn: A connection the caller already holds (e.g. inside a
+            transaction) instead of one from the pool
+    """
+    started = time.perf_counter()
+    acquired = started
+    try:
+        if conn is not None:
+            result = await call(conn)
+        else:
+            pool = await get_pool()
+            async with pool.acquire() as pooled:
+                acquired = time.perf_counter()
+                result = await call(pooled)
     except Exception as e:
-        logger.error(f"Database query error: {e}")
-        logger.error(f"Query: {query}")
-        logger.error(f"Args: {args}")
+        query_metrics.record_error(query_name(query))
+        _log_query_error(kind, query, args, e)
         raise
+    
+    acquire_wait = acquired - started if conn is None else None
+    _record_query(query, acquire_wait, time.perf_counter() - acquired, _row_count(result))
+    return result
 
-async def fetch_query(query: str, *args) -> List[Dict[str, Any]]:
+def get_query_stats() -> Dict[str, Any]:
+    """Get query latency histograms, pool acquire wait and slow query counts for monitoring"""
+    return query_metrics.stats()
+
+async def execute_query(query: Union[Query, str], *args) -> str:
+    """Execute a database query with parameters"""
+    return await run_timed(query, args, lambda conn: conn.execute(_sql(query), *args))
+
+async def fetch_query(query: Union[Query, str], *args) -> List[Dict[str, Any]]:
     """Fetch data from the database with parameters"""
+    rows = await run_timed(query, args, lambda conn: conn.fetch(_sql(query), *args), "fetch")
+    return [dict(row) for row in rows]
+
+async def fetch_rows(query: Union[Query, str], *args) -> List[Any]:
+    """Fetch rows as the query's row type (asyncpg records for plain SQL)"""
+    rows = await run_timed(query, args, lambda conn: conn.fetch(_sql(query), *args), "fetch")
+    
+    row_type = query.row_type if isinstance(query, Query) else None
+    return [row_type(*row) for row in rows] if row_type is not None else rows
+
+async def fetchrow(query: Union[Query, str], *args) -> Optional[Any]:
+    """Fetch the first row as the query's row type, or None"""
+    row = await run_timed(query, args, lambda conn: conn.fetchrow(_sql(query), *args), "fetch")
+    
+    row_type = query.row_type if isinstance(query, Query) else None
+    return row_type(*row) if row is not None and row_type is not None else row
+
+async def fetchval(query: Union[Query, str], *args) -> Any:
+    """Fetch the first column of the first row, or None"""
+    return await run_timed(query, args, lambda conn: conn.fetchval(_sql(query), *args), "fetch")
+
+async def stream_query(query: Union[Query, str], *args, prefetch: Optional[int] = None) -> AsyncIterator[Any]:
+    """
+    Iterate over a large result set in constant memory
+    
+    Rows come from a server-side cursor, prefetch rows per round trip, inside a
+    read-only transaction that holds one pool connection until iteration ends.
+    Wrap the call in contextlib.aclosing() when the loop may stop early, so the
+    connection is released straight away rather than when the generator is
+    garbage collected.
+    
+    The time recorded in query_metrics covers the whole iteration, including
+    the caller's work between rows, so streams are left out of the slow query log.
+    
+    Args:
+        query: A registered Query (rows are returned as its row type) or plain SQL
+        prefetch: Rows fetched per round trip, DATABASE_CONFIG["stream_prefetch"] by default
+    """
+    if prefetch is None:
+        prefetch = DATABASE_CONFIG["stream_prefetch"]
+    row_type = query.row_type if isinstance(query, Query) else None
+    
     pool = await get_pool()
+    started = time.perf_counter()
+    acquired = None
+    rows = 0
     try:
         async with pool.acquire() as conn:
-            rows = await conn.fetch(query, *args)
-            return [dict(row) for row in rows]
+            acquired = time.perf_counter()
+            async with conn.transaction(readonly=True):
+                async for row in conn.cursor(_sql(query), *args, prefetch=prefetch):
+                    rows += 1
+                    yield row_type(*row) if row_type is not None else row
     except Exception as e:
-        logger.error(f"Database fetch error: {e}")
-        logger.error(f"Query: {query}")
-        logger.error(f"Args: {args}")
+        query_metrics.record_error(query_name(query))
+        _log_query_error("stream", query, args, e)
         raise
+    finally:
+        if acquired is not None:
+            _record_query(query, acquired - started, time.perf_counter() - acquired, rows, slow_log=False)
+
+class Migration(NamedTuple):
+    """
+    One step of the schema, applied once and recorded in schema_version.
+    
+    A failed CREATE INDEX CONCURRENTLY leaves an invalid index behind, which
+    IF NOT EXISTS would then skip; drop the index first in the same migration
+    so a retry rebuilds it. The runner refuses to record a migration whose
+    indexes came out invalid.
+    """
+    version: int
+    description: str
+    statements: List[str]
+    # CREATE INDEX CONCURRENTLY and friends can't run inside a transaction
+    transactional: bool = True
 
-async def create_tables():
-    """Create all required database tables if they don't exist"""
-    # Define all table creation queries
-    tables = [
+# Ordered list of schema changes. Never edit a migration that has shipped; add a new one instead.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Initial tables", [
         # Store verified users
         """
         CREATE TABLE IF NOT EXISTS verified_users (
@@ -136,13 +430,399 @@ async def create_tables():
             duration INT
         )
         """
-    ]
+    ]),
+    
+    Migration(2, "Store Roblox profiles", [
+        # Store Roblox profiles so lookups survive restarts
+        """
+        CREATE TABLE IF NOT EXISTS roblox_profiles (
+            roblox_id BIGINT PRIMARY KEY,
+            username TEXT NOT NULL,
+            display_name TEXT,
+            created_at TIMESTAMP,
+            description_hash TEXT,
+            fetched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        
+        # Look up Roblox profiles by username
+        """
+        CREATE INDEX IF NOT EXISTS idx_roblox_profiles_username
+        ON roblox_profiles (LOWER(username))
+        """
+    ]),
     
-    # Create each table
+    # Built concurrently so large mod_actions tables stay writable while the indexes build.
+    # If a build fails it leaves an invalid index behind; drop it before restarting.
+    Migration(3, "Indexes for hot ticket, moderation and verification queries", [
+        # A user's open ticket in a guild, checked on every ticket button click; unique, so
+        # a member has at most one open ticket
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_tickets_one_open_per_user",
+        
+        # Close all but the newest of any duplicate open tickets left by racing clicks. If an
+        # older instance opens a duplicate before the build below finishes, the build fails,
+        # the migration isn't recorded, and the next start dedupes and builds again.
+        """
+        UPDATE tickets SET status = 'closed', closed_at = CURRENT_TIMESTAMP
+        WHERE status = 'open' AND id NOT IN (
+            SELECT MAX(id) FROM tickets WHERE status = 'open' GROUP BY guild_id, user_id
+        )
+        """,
+        
+        """
+        CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_tickets_one_open_per_user
+        ON tickets (guild_id, user_id) INCLUDE (channel_id)
+        WHERE status = 'open'
+        """,
+        
+        # Closing a ticket by its channel
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_tickets_channel",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tickets_channel
+        ON tickets (channel_id)
+        """,
+        
+        # /modlogs: a member's history in a guild, newest first, paged by (timestamp, id)
+        # so id is there as a tiebreaker
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_mod_actions_target_keyset",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_mod_actions_target_keyset
+        ON mod_actions (guild_id, target_id, timestamp DESC, id DESC)
+        """,
+        
+        # Warn counts, answered from the index alone
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_mod_actions_warns",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_mod_actions_warns
+        ON mod_actions (guild_id, target_id)
+        WHERE action_type = 'warn'
+        """,
+        
+        # Which Discord account a Roblox account is linked to
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_verified_users_roblox_id",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_verified_users_roblox_id
+        ON verified_users (roblox_id) INCLUDE (discord_id)
+        """
+    ], transactional=False),
+    
+    # Lets GuildConfigCache drop a guild as soon as any instance or tool changes its settings
+    Migration(4, "Notify listeners when guild settings or ticket roles change", [
+        """
+        CREATE OR REPLACE FUNCTION notify_guild_config_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('guild_config', OLD.guild_id::text);
+            ELSE
+                PERFORM pg_notify('guild_config', NEW.guild_id::text);
+                IF TG_OP = 'UPDATE' AND OLD.guild_id <> NEW.guild_id THEN
+                    PERFORM pg_notify('guild_config', OLD.guild_id::text);
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        
+        "DROP TRIGGER IF EXISTS guild_settings_notify ON guild_settings",
+        """
+        CREATE TRIGGER guild_settings_notify
+        AFTER INSERT OR UPDATE OR DELETE ON guild_settings
+        FOR EACH ROW EXECUTE FUNCTION notify_guild_config_change()
+        """,
+        
+        "DROP TRIGGER IF EXISTS ticket_support_roles_notify ON ticket_support_roles",
+        """
+        CREATE TRIGGER ticket_support_roles_notify
+        AFTER INSERT OR UPDATE OR DELETE ON ticket_support_roles
+        FOR EACH ROW EXECUTE FUNCTION notify_guild_config_change()
+        """
+    ]),
+    
+    Migration(5, "Where a ticket's transcript was archived", [
+        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS transcript_location TEXT"
+    ]),
+    
+    # A member's ticket being opened on some instance; see utils.ticket_repository
+    Migration(6, "Reserve ticket openings across instances", [
+        """
+        CREATE TABLE IF NOT EXISTS ticket_reservations (
+            guild_id BIGINT NOT NULL,
+            user_id BIGINT NOT NULL,
+            token UUID NOT NULL,
+            reserved_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (guild_id, user_id)
+        )
+        """
+    ])
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+# Arbitrary key for the advisory lock, so only one instance migrates at a time
+MIGRATION_LOCK_ID = 7262_0001
+
+# How often an instance waiting for another one's migration checks the lock (in seconds)
+MIGRATION_LOCK_POLL_INTERVAL = 0.5
+
+async def _current_schema_version(conn: asyncpg.Connection) -> int:
+    """Get the applied schema version, or 0 on a fresh database"""
     try:
-        for table_query in tables:
-            await execute_query(table_query)
-        logger.info("Database tables created/verified successfully")
-    except Exception as e:
-        logger.error(f"Error creating database tables: {e}")
-        raise
+        return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    except asyncpg.UndefinedTableError:
+        return 0
+
+async def run_migrations():
+    """Apply any migrations the database doesn't have yet"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        # Fast path: a single query when the schema is already current
+        version = await _current_schema_version(conn)
+        if version >= SCHEMA_VERSION:
+            logger.info(f"Database schema is up to date (version {version})")
+            return
+        
+        # Another instance may be migrating right now; wait for it, then re-check.
+        # This polls instead of blocking in pg_advisory_lock, because a blocked statement is an
+        # open transaction, and CREATE INDEX CONCURRENTLY in the other instance would wait for it.
+        while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", MIGRATION_LOCK_ID):
+            await asyncio.sleep(MIGRATION_LOCK_POLL_INTERVAL)
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            version = await _current_schema_version(conn)
+            if version >= SCHEMA_VERSION:
+                logger.info(f"Database schema was migrated by another instance (version {version})")
+                return
+            
+            for migration in MIGRATIONS:
+                if migration.version <= version:
+                    continue
+                
+                try:
+                    if migration.transactional:
+                        async with conn.transaction():
+                            await _apply_migration(conn, migration)
+                    else:
+                        await _apply_migration(conn, migration)
+                except Exception as e:
+                    logger.error(f"Error applying migration {migration.version} ({migration.description}): {e}")
+                    raise
+                logger.info(f"Applied migration {migration.version}: {migration.description}")
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+        
+        logger.info(f"Database schema migrated from version {version} to {SCHEMA_VERSION}")
+
+# Names the indexes a migration builds, to check they're valid before recording it
+_CREATED_INDEX = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+async def _apply_migration(conn: asyncpg.Connection, migration: Migration):
+    """
+    Run a migration's statements and record it
+    
+    Raises:
+        RuntimeError: An index the migration builds is invalid (an interrupted or
+            failed concurrent build); the migration isn't recorded, so it runs again
+    """
+    for statement in migration.statements:
+        await conn.execute(statement)
+    
+    index_names = [match.group(1) for statement in migration.statements for match in _CREATED_INDEX.finditer(statement)]
+    if index_names:
+        invalid = await conn.fetch(
+            """
+            SELECT c.relname FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = ANY($1::TEXT[])
+              AND c.relnamespace = current_schema()::regnamespace
+              AND NOT i.indisvalid
+            """,
+            index_names
+        )
+        if invalid:
+            raise RuntimeError(f"Invalid index(es) after migration {migration.version}: {', '.join(row['relname'] for row in invalid)}")
+    
+    await conn.execute(
+        "INSERT INTO schema_version (version, description) VALUES ($1, $2)",
+        migration.version,
+        migration.description
+    )
+
+# NOTIFY channel used by the migration 4 triggers
+GUILD_CONFIG_CHANNEL = "guild_config"
+
+class GuildConfig(NamedTuple):
+    """A guild's settings row together with its ticket support roles"""
+    guild_id: int
+    verified_role_id: Optional[int] = None
+    ticket_category_id: Optional[int] = None
+    log_channel_id: Optional[int] = None
+    welcome_channel_id: Optional[int] = None
+    welcome_message: Optional[str] = None
+    prefix: str = "!"
+    support_role_ids: Tuple[int, ...] = ()
+
+class GuildConfigCache:
+    """
+    In-memory copy of guild_settings and ticket_support_roles.
+    
+    A guild is loaded in one query on first use and served from memory after
+    that. Triggers on both tables NOTIFY the guild ID on every change, which
+    drops that guild from the cache; the TTL covers notifications missed while
+    the LISTEN connection is down.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 300,
+        reconnect_delay: float = 5,
+        keepalive_interval: float = 60
+    ):
+        self.reconnect_delay = reconnect_delay
+        self.keepalive_interval = keepalive_interval
+        self._cache = TTLCache(max_entries, ttl)
+        self._loads = SingleFlight()
+        # Bumped per guild on invalidate() and for every guild on clear(). Loads are
+        # shared per generation, so a read after an invalidation never joins, or
+        # caches, a load that started before it. Only guilds with a load in flight
+        # need a generation, so it is dropped along with the guild's last load; the
+        # values come from one counter, so a dropped generation is never reissued.
+        self._generations: Dict[int, int] = {}
+        self._invalidations = 0
+        self._loading: Dict[int, int] = {}
+        self._epoch = 0
+        self._listener: Optional[asyncpg.Connection] = None
+        self._listen_task: Optional[asyncio.Task] = None
+        self.notifications = 0
+    
+    async def get(self, guild_id: int) -> GuildConfig:
+        """Get a guild's settings, loading them if they aren't cached"""
+        config = self._cache.get(guild_id)
+        if config is not MISSING:
+            return config
+        generation = self._generation(guild_id)
+        return await self._loads.do((guild_id, generation), lambda: self._load(guild_id, generation))
+    
+    def _generation(self, guild_id: int) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(guild_id, 0)
+    
+    async def _load(self, guild_id: int, generation: Tuple[int, int]) -> GuildConfig:
+        self._loading[guild_id] = self._loading.get(guild_id, 0) + 1
+        # Runs after SingleFlight forgets the task, so once the count reaches zero
+        # no read can join a load of the generation being dropped
+        asyncio.current_task().add_done_callback(lambda task: self._load_done(guild_id))
+        row = await fetchrow(GUILD_CONFIG, guild_id)
+        config = GuildConfig(
+            guild_id=guild_id,
+            verified_role_id=row["verified_role_id"],
+            ticket_category_id=row["ticket_category_id"],
+            log_channel_id=row["log_channel_id"],
+            welcome_channel_id=row["welcome_channel_id"],
+            welcome_message=row["welcome_message"],
+            prefix=row["prefix"],
+            support_role_ids=tuple(row["support_role_ids"])
+        )
+        
+        if generation == self._generation(guild_id):
+            self._cache.set(guild_id, config)
+        return config
+    
+    def _load_done(self, guild_id: int):
+        remaining = self._loading[guild_id] - 1
+        if remaining:
+            self._loading[guild_id] = remaining
+        else:
+            del self._loading[guild_id]
+            self._generations.pop(guild_id, None)
+    
+    def invalidate(self, guild_id: int):
+        """Forget a guild's settings; writers call this right after changing them"""
+        # With nothing loading, any later load reads the change anyway
+        if guild_id in self._loading:
+            self._invalidations += 1
+            self._generations[guild_id] = self._invalidations
+        self._cache.invalidate(guild_id)
+    
+    def clear(self):
+        """Forget every guild"""
+        self._epoch += 1
+        self._generations.clear()
+        self._cache.clear()
+    
+    def _on_notify(self, conn: asyncpg.Connection, pid: int, channel: str, payload: str):
+        self.notifications += 1
+        try:
+            self.invalidate(int(payload))
+        except ValueError:
+            logger.warning(f"Unexpected {channel} notification payload: {payload!r}")
+            self.clear()
+    
+    def start(self):
+        """Start listening for change notifications"""
+        if self._listen_task is None or self._listen_task.done():
+            self._listen_task = asyncio.create_task(self._listen())
+    
+    async def stop(self):
+        """Stop listening and close the LISTEN connection"""
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except asyncio.CancelledError:
+                pass
+            self._listen_task = None
+    
+    async def _listen(self):
+        """Keep a dedicated LISTEN connection open, reconnecting whenever it drops"""
+        while True:
+            conn = None
+            lost = asyncio.Event()
+            try:
+                # Its own connection rather than a pool one, since it's held for the bot's lifetime
+                conn = await asyncpg.connect(dsn=dsn)
+                conn.add_termination_listener(lambda c: lost.set())
+                await conn.add_listener(GUILD_CONFIG_CHANNEL, self._on_notify)
+                self._listener = conn
+                
+                # Anything cached may have changed while nobody was listening
+                self.clear()
+                logger.info("Listening for guild config changes")
+                
+                # A query now and then, so a connection that died silently is noticed
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), self.keepalive_interval)
+                    except asyncio.TimeoutError:
+                        await conn.execute("SELECT 1")
+                logger.warning("Guild config LISTEN connection was closed")
+            except Exception as e:
+                logger.error(f"Guild config LISTEN connection failed: {e}")
+            finally:
+                self._listener = None
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            
+            await asyncio.sleep(self.reconnect_delay)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters and listener state for monitoring"""
+        return {
+            **self._cache.stats(),
+            "listening": self._listener is not None,
+            "notifications": self.notifications
+        }
+
+# Shared by all cogs; the bot starts and stops the listener
+guild_config = GuildConfigCache(
+    max_entries=DATABASE_CONFIG["guild_config_max_entries"],
+    ttl=DATABASE_CONFIG["guild_config_ttl"],
+    reconnect_delay=DATABASE_CONFIG["listen_reconnect_delay"],
+    keepalive_interval=DATABASE_CONFIG["listen_keepalive_interval"]
+)
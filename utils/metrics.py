@@ -0,0 +1,147 @@
+import bisect
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds of the latency buckets (in milliseconds); anything slower lands in +Inf
+DEFAULT_BUCKETS_MS: Tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Escape a Prometheus label value
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram.
+    
+    Recording is O(log buckets) with no per-sample storage, so it can sit on
+    every query. Percentiles are estimated as the upper bound of the bucket
+    they fall in.
+    """
+    
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+    
+    def record(self, duration_ms: float):
+        self.counts[bisect.bisect_left(self.buckets_ms, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        if duration_ms > self.max_ms:
+            self.max_ms = duration_ms
+    
+    def percentile(self, percent: float) -> Optional[float]:
+        """Estimate a percentile (the bucket's upper bound, or the max for the last bucket)"""
+        if not self.count:
+            return None
+        rank = percent / 100 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets_ms[i] if i < len(self.buckets_ms) else self.max_ms
+        return self.max_ms
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get count, mean, percentiles and max (in milliseconds) for monitoring"""
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 3)
+        }
+    
+    def prometheus_lines(self, metric: str, labels: str = "") -> List[str]:
+        """Render as a Prometheus histogram (cumulative buckets, in seconds)"""
+        separator = "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets_ms, self.counts):
+            cumulative += bucket_count
+            lines.append(f'{metric}_bucket{{{labels}{separator}le="{bound / 1000:g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{labels}{separator}le="+Inf"}} {self.count}')
+        lines.append(f"{metric}_sum{{{labels}}} {self.total_ms / 1000:.6f}")
+        lines.append(f"{metric}_count{{{labels}}} {self.count}")
+        return lines
+
+class QueryMetrics:
+    """
+    Per-query latency histograms, row counts and errors, plus one histogram for
+    the time spent waiting for a pooled connection.
+    
+    Only the event loop records; the status server reads the counters from its
+    own thread, so readers copy each dict before iterating it (the loop may add
+    a query name mid-read) and at worst see a sample half-recorded.
+    """
+    
+    def __init__(self):
+        self.acquire = LatencyHistogram()
+        self._latency: Dict[str, LatencyHistogram] = {}
+        self._rows: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self.slow_queries = 0
+    
+    def record(self, name: str, acquire_ms: Optional[float], duration_ms: float, rows: int):
+        if acquire_ms is not None:
+            self.acquire.record(acquire_ms)
+        histogram = self._latency.get(name)
+        if histogram is None:
+            histogram = self._latency[name] = LatencyHistogram()
+        histogram.record(duration_ms)
+        self._rows[name] = self._rows.get(name, 0) + rows
+    
+    def record_error(self, name: str):
+        self._errors[name] = self._errors.get(name, 0) + 1
+    
+    def _snapshot(self) -> Tuple[Dict[str, LatencyHistogram], Dict[str, int], Dict[str, int]]:
+        # dict(d) copies in C without running Python code, so the loop thread
+        # can't resize the dict part-way through the way it can a for loop
+        return dict(self._latency), dict(self._rows), dict(self._errors)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get per-query latency, rows and errors, and pool acquire wait, for monitoring"""
+        latency, rows, errors = self._snapshot()
+        queries = {}
+        for name in sorted(set(latency) | set(errors)):
+            histogram = latency.get(name)
+            entry = histogram.stats() if histogram is not None else LatencyHistogram().stats()
+            entry["rows"] = rows.get(name, 0)
+            entry["errors"] = errors.get(name, 0)
+            queries[name] = entry
+        return {
+            "queries": queries,
+            "pool_acquire": self.acquire.stats(),
+            "slow_queries": self.slow_queries
+        }
+    
+    def prometheus(self, prefix: str = "discord_bot_db") -> str:
+        """Render everything in the Prometheus text exposition format"""
+        latency, query_rows, query_errors = self._snapshot()
+        lines = [
+            f"# HELP {prefix}_query_duration_seconds Query execution time, excluding the pool wait",
+            f"# TYPE {prefix}_query_duration_seconds histogram"
+        ]
+        for name, histogram in sorted(latency.items()):
+            lines.extend(histogram.prometheus_lines(f"{prefix}_query_duration_seconds", f'query="{_label(name)}"'))
+        
+        lines.append(f"# HELP {prefix}_query_rows_total Rows returned or affected")
+        lines.append(f"# TYPE {prefix}_query_rows_total counter")
+        for name, rows in sorted(query_rows.items()):
+            lines.append(f'{prefix}_query_rows_total{{query="{_label(name)}"}} {rows}')
+        
+        lines.append(f"# HELP {prefix}_query_errors_total Queries that raised")
+        lines.append(f"# TYPE {prefix}_query_errors_total counter")
+        for name, errors in sorted(query_errors.items()):
+            lines.append(f'{prefix}_query_errors_total{{query="{_label(name)}"}} {errors}')
+        
+        lines.append(f"# HELP {prefix}_pool_acquire_seconds Time spent waiting for a pooled connection")
+        lines.append(f"# TYPE {prefix}_pool_acquire_seconds histogram")
+        lines.extend(self.acquire.prometheus_lines(f"{prefix}_pool_acquire_seconds"))
+        
+        lines.append(f"# HELP {prefix}_slow_queries_total Queries over the slow query threshold")
+        lines.append(f"# TYPE {prefix}_slow_queries_total counter")
+        lines.append(f"{prefix}_slow_queries_total {self.slow_queries}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,268 @@
+# Named SQL shared by the cogs.
+#
+# Run these through the helpers in utils.database (execute_query, fetch_rows,
+# fetchrow, fetchval). asyncpg keeps every statement it has run prepared on
+# each pooled connection, so a registered query is parsed and planned once per
+# connection and then only bound and executed. Queries with a row_type return
+# that NamedTuple instead of a dict.
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+class Query(NamedTuple):
+    """A named SQL statement, optionally with the row type its results are returned as"""
+    name: str
+    sql: str
+    row_type: Optional[type] = None
+
+# Row types
+
+class VerifiedUserRow(NamedTuple):
+    roblox_id: int
+    roblox_username: str
+
+class TicketContextRow(NamedTuple):
+    reserved: bool
+    open_channel_id: Optional[int]
+    ticket_category_id: Optional[int]
+    support_role_ids: List[int]
+
+class TicketRow(NamedTuple):
+    id: int
+    guild_id: int
+    channel_id: int
+    user_id: int
+    ticket_type: str
+
+class OpenTicketRow(NamedTuple):
+    id: int
+    guild_id: int
+    channel_id: int
+
+class ModActionRow(NamedTuple):
+    id: int
+    action_type: str
+    reason: Optional[str]
+    timestamp: datetime
+    user_id: int
+    duration: Optional[int]
+
+# Tickets
+
+OPEN_TICKET_CHANNEL = Query(
+    "open_ticket_channel",
+    "SELECT channel_id FROM tickets WHERE guild_id = $1 AND user_id = $2 AND status = 'open'"
+)
+
+# Gets everything opening a ticket needs: the user's open ticket (if any), the
+# category and the support roles. If the user has no open ticket it also reserves
+# the opening ($3 is the reservation's token, $4 how many seconds before an
+# abandoned reservation can be taken over). Always returns one row; reserved is
+# false if the user has an open ticket or another opening holds the reservation.
+TICKET_OPEN_CONTEXT = Query(
+    "ticket_open_context",
+    """
+    WITH reservation AS (
+        INSERT INTO ticket_reservations (guild_id, user_id, token, reserved_at)
+        SELECT $1, $2, $3, CURRENT_TIMESTAMP
+        WHERE NOT EXISTS (
+            SELECT 1 FROM tickets WHERE guild_id = $1 AND user_id = $2 AND status = 'open'
+        )
+        ON CONFLICT (guild_id, user_id) DO UPDATE
+        SET token = EXCLUDED.token, reserved_at = EXCLUDED.reserved_at
+        WHERE ticket_reservations.reserved_at < CURRENT_TIMESTAMP - make_interval(secs => $4)
+        RETURNING token
+    ), open_ticket AS (
+        SELECT channel_id FROM tickets
+        WHERE guild_id = $1 AND user_id = $2 AND status = 'open'
+        ORDER BY id DESC
+        LIMIT 1
+    ), settings AS (
+        SELECT ticket_category_id FROM guild_settings WHERE guild_id = $1
+    )
+    SELECT EXISTS (SELECT 1 FROM reservation) AS reserved,
+           (SELECT channel_id FROM open_ticket) AS open_channel_id,
+           (SELECT ticket_category_id FROM settings) AS ticket_category_id,
+           ARRAY(
+               SELECT role_id FROM ticket_support_roles
+               WHERE guild_id = $1 ORDER BY id
+           ) AS support_role_ids
+    """,
+    TicketContextRow
+)
+
+# A ticket whose channel was deleted without closing it
+CLOSE_STALE_TICKET = Query(
+    "close_stale_ticket",
+    "UPDATE tickets SET status = 'closed' WHERE channel_id = $1"
+)
+
+# Returns no row if the ticket was already closed
+CLOSE_TICKET = Query(
+    "close_ticket",
+    "UPDATE tickets SET status = 'closed', closed_at = $1 WHERE id = $2 AND status = 'open' RETURNING id"
+)
+
+# Every open ticket old enough for its channel to be in the gateway cache, grouped by
+# guild (read off idx_tickets_one_open_per_user)
+OPEN_TICKETS_BEFORE = Query(
+    "open_tickets_before",
+    """
+    SELECT id, guild_id, channel_id FROM tickets
+    WHERE status = 'open' AND created_at < $1
+    ORDER BY guild_id
+    """,
+    OpenTicketRow
+)
+
+# Returns the IDs actually closed, skipping any closed in the meantime
+CLOSE_TICKETS = Query(
+    "close_tickets",
+    "UPDATE tickets SET status = 'closed', closed_at = $1 WHERE id = ANY($2::INT[]) AND status = 'open' RETURNING id"
+)
+
+SET_TICKET_TRANSCRIPT = Query(
+    "set_ticket_transcript",
+    "UPDATE tickets SET transcript_location = $1 WHERE id = $2"
+)
+
+TICKET_BY_ID = Query(
+    "ticket_by_id",
+    "SELECT id, guild_id, channel_id, user_id, ticket_type FROM tickets WHERE id = $1",
+    TicketRow
+)
+
+# Newest first, since a channel ID is only reused if Discord recycles it
+TICKET_BY_CHANNEL = Query(
+    "ticket_by_channel",
+    """
+    SELECT id, guild_id, channel_id, user_id, ticket_type FROM tickets
+    WHERE channel_id = $1
+    ORDER BY id DESC
+    LIMIT 1
+    """,
+    TicketRow
+)
+
+# Returns no row if the member already has an open ticket (idx_tickets_one_open_per_user)
+INSERT_TICKET = Query(
+    "insert_ticket",
+    """
+    INSERT INTO tickets (guild_id, channel_id, user_id, created_at, status, ticket_type)
+    VALUES ($1, $2, $3, $4, 'open', $5)
+    ON CONFLICT (guild_id, user_id) WHERE status = 'open' DO NOTHING
+    RETURNING id
+    """
+)
+
+# Reserves the opening of a user whose open ticket turned out to be stale (its channel
+# was deleted); no row while another opening holds the reservation
+RESERVE_TICKET_OPENING = Query(
+    "reserve_ticket_opening",
+    """
+    INSERT INTO ticket_reservations (guild_id, user_id, token, reserved_at)
+    VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
+    ON CONFLICT (guild_id, user_id) DO UPDATE
+    SET token = EXCLUDED.token, reserved_at = EXCLUDED.reserved_at
+    WHERE ticket_reservations.reserved_at < CURRENT_TIMESTAMP - make_interval(secs => $4)
+    RETURNING token
+    """
+)
+
+# Ends a ticket opening; a no-op if the reservation was taken over after expiring
+RELEASE_TICKET_RESERVATION = Query(
+    "release_ticket_reservation",
+    "DELETE FROM ticket_reservations WHERE guild_id = $1 AND user_id = $2 AND token = $3"
+)
+
+# Guild settings
+
+GUILD_CONFIG = Query(
+    "guild_config",
+    """
+    SELECT s.verified_role_id, s.ticket_category_id, s.log_channel_id,
+           s.welcome_channel_id, s.welcome_message, COALESCE(s.prefix, '!') AS prefix,
+           ARRAY(
+               SELECT role_id FROM ticket_support_roles
+               WHERE guild_id = $1 ORDER BY id
+           ) AS support_role_ids
+    FROM (SELECT $1::BIGINT AS guild_id) AS g
+    LEFT JOIN guild_settings s ON s.guild_id = g.guild_id
+    """
+)
+
+ADD_TICKET_SUPPORT_ROLE = Query(
+    "add_ticket_support_role",
+    """
+    INSERT INTO ticket_support_roles (guild_id, role_id)
+    VALUES ($1, $2)
+    ON CONFLICT (guild_id, role_id) DO NOTHING
+    """
+)
+
+SET_TICKET_CATEGORY = Query(
+    "set_ticket_category",
+    """
+    INSERT INTO guild_settings (guild_id, ticket_category_id)
+    VALUES ($1, $2)
+    ON CONFLICT (guild_id) DO UPDATE SET
+    ticket_category_id = $2
+    """
+)
+
+# Verification
+
+VERIFIED_USER_BY_DISCORD_ID = Query(
+    "verified_user_by_discord_id",
+    "SELECT roblox_id, roblox_username FROM verified_users WHERE discord_id = $1",
+    VerifiedUserRow
+)
+
+DISCORD_ID_BY_ROBLOX_ID = Query(
+    "discord_id_by_roblox_id",
+    "SELECT discord_id FROM verified_users WHERE roblox_id = $1"
+)
+
+INSERT_VERIFIED_USER = Query(
+    "insert_verified_user",
+    """
+    INSERT INTO verified_users (discord_id, discord_username, roblox_id, roblox_username)
+    VALUES ($1, $2, $3, $4)
+    """
+)
+
+UPDATE_VERIFIED_USER = Query(
+    "update_verified_user",
+    """
+    UPDATE verified_users
+    SET roblox_id = $1, roblox_username = $2, discord_username = $3
+    WHERE discord_id = $4
+    """
+)
+
+# Moderation
+
+WARN_COUNT = Query(
+    "warn_count",
+    """
+    SELECT COUNT(*) FROM mod_actions
+    WHERE guild_id = $1 AND target_id = $2 AND action_type = 'warn'
+    """
+)
+
+# One page of a member's history, newest first, starting just after the (timestamp, id)
+# cursor of the previous page. Pass datetime.max and 0 for the first page. Optional filters
+# on action type ($5) and moderator ($6) are NULL to match everything.
+MOD_ACTIONS_PAGE = Query(
+    "mod_actions_page",
+    """
+    SELECT id, action_type, reason, timestamp, user_id, duration
+    FROM mod_actions
+    WHERE guild_id = $1 AND target_id = $2
+      AND (timestamp, id) < ($3, $4)
+      AND ($5::TEXT IS NULL OR action_type = $5)
+      AND ($6::BIGINT IS NULL OR user_id = $6)
+    ORDER BY timestamp DESC, id DESC
+    LIMIT $7
+    """,
+    ModActionRow
+)
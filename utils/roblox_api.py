@@ -1,60 +1,550 @@
 import os
+import asyncio
 import aiohttp
+import hashlib
 import logging
 import re
 import json
-from typing import Dict, Any, Optional, List, Union
+from datetime import datetime, timezone
+from typing import Dict, Any, Literal, Optional, List, Set, Tuple, Union
+from urllib.parse import urlsplit
+from config import ROBLOX_API_CONFIG, ROBLOX_CACHE_CONFIG, ROBLOX_BATCH_CONFIG
+from utils.cache import TTLCache, MISSING
+from utils.database import execute_query, fetch_query
+from utils.coalesce import MicroBatcher, SingleFlight
+from utils.resilience import TokenBucket, CircuitBreaker, backoff_delay, parse_retry_after
 
 # Setup logging
 logger = logging.getLogger('discord_bot.roblox_api')
 
 # Constants
-ROBLOX_API_BASE = "https://api.roblox.com"
-ROBLOX_USERS_API_BASE = "https://users.roblox.com"
-ROBLOX_THUMBNAILS_API = "https://thumbnails.roblox.com"
+# Both can be pointed at a local stand-in such as tools/mock_roblox_api.py
+ROBLOX_USERS_API_BASE = os.getenv("ROBLOX_USERS_API_BASE", "https://users.roblox.com")
+ROBLOX_THUMBNAILS_API = os.getenv("ROBLOX_THUMBNAILS_API", "https://thumbnails.roblox.com")
 
-async def get_roblox_user(username: str) -> Optional[Dict[str, Any]]:
+# How much of a profile get_roblox_user fetches
+FIELDS_ID = "id"        # id and username
+FIELDS_BASIC = "basic"  # id, username and display name (no profile details request)
+FIELDS_FULL = "full"    # everything, including description and creation date
+
+class RobloxAPIError(Exception):
+    """Raised when a Roblox API request returns an unexpected status"""
+    
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class RobloxUnavailableError(RobloxAPIError):
+    """
+    Raised when Roblox is rate limiting us or is degraded, so the request
+    could not be answered. This does not mean the user or data doesn't exist.
+    """
+    
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message, status)
+        self.retry_after = retry_after
+
+class RobloxClient:
+    """
+    Owns the long-lived HTTP session used for all Roblox API calls.
+    
+    Reusing one session keeps connections alive between requests, so lookups
+    don't pay a fresh DNS lookup and TCP/TLS handshake every time.
+    """
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = {**ROBLOX_API_CONFIG, **(config or {})}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+    
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+    
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self.closed:
+            raise RuntimeError("Roblox client has not been started")
+        return self._session
+    
+    async def start(self):
+        """Create the pooled session if it isn't already open"""
+        if not self.closed:
+            return
+        
+        connector = aiohttp.TCPConnector(
+            limit=self.config["connection_limit"],
+            limit_per_host=self.config["connection_limit_per_host"],
+            keepalive_timeout=self.config["keepalive_timeout"],
+            ttl_dns_cache=self.config["dns_cache_ttl"],
+            use_dns_cache=True
+        )
+        timeouts = self.config["timeouts"]
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                total=timeouts["total"],
+                connect=timeouts["connect"],
+                sock_read=timeouts["sock_read"]
+            ),
+            raise_for_status=False
+        )
+        logger.info("Roblox API session created")
+    
+    async def close(self):
+        """Close the session and release all pooled connections"""
+        if self.closed:
+            return
+        
+        await self._session.close()
+        self._session = None
+        logger.info("Roblox API session closed")
+    
+    def _limits_for(self, host: str) -> Tuple[TokenBucket, CircuitBreaker]:
+        """Get the rate limiter and circuit breaker for a Roblox host"""
+        if host not in self._buckets:
+            rate_limit = self.config["rate_limit"]
+            breaker = self.config["circuit_breaker"]
+            self._buckets[host] = TokenBucket(rate_limit["requests_per_second"], rate_limit["burst"])
+            self._breakers[host] = CircuitBreaker(breaker["failure_threshold"], breaker["recovery_timeout"])
+        return self._buckets[host], self._breakers[host]
+    
+    async def request(self, method: str, url: str, **kwargs) -> Tuple[int, Any]:
+        """
+        Send a request with rate limiting, retries and the circuit breaker applied
+        
+        Args:
+            method: The HTTP method
+            url: The full request URL
+            **kwargs: Passed on to aiohttp (json, params, ...)
+        
+        Returns:
+            The response status and the decoded JSON body (None unless the status is 200)
+        
+        Raises:
+            RobloxUnavailableError: Roblox kept rate limiting or failing, or the circuit is open
+        """
+        bucket, breaker = self._limits_for(urlsplit(url).netloc)
+        retries = self.config["retries"]
+        status = None
+        
+        for attempt in range(retries["max_retries"] + 1):
+            if not breaker.allow():
+                raise RobloxUnavailableError(
+                    "Roblox API is unavailable (circuit open)",
+                    status=status,
+                    retry_after=breaker.retry_after
+                )
+            
+            delay = backoff_delay(attempt, retries["backoff_base"], retries["backoff_max"])
+            # Every way out of the block below must record an outcome or release the
+            # breaker, or a half-open breaker waits forever on a trial that's gone
+            recorded = False
+            try:
+                await bucket.acquire()
+                async with self.session.request(method, url, **kwargs) as response:
+                    status = response.status
+                    if status != 429 and status < 500:
+                        breaker.record_success()
+                        recorded = True
+                        data = await response.json() if status == 200 else None
+                        return status, data
+                    
+                    breaker.record_failure()
+                    recorded = True
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if retry_after is not None:
+                        # Honor Roblox's requested wait, with a little jitter so waiters don't stampede
+                        delay = retry_after + delay / 4
+                    logger.warning(f"Roblox API returned {status} for {method} {url} (attempt {attempt + 1})")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if not recorded:
+                    breaker.record_failure()
+                logger.warning(f"Roblox API request failed for {method} {url} (attempt {attempt + 1}): {e!r}")
+            except asyncio.CancelledError:
+                # The caller gave up, which says nothing about Roblox; let the next call be the trial
+                if not recorded:
+                    breaker.release()
+                raise
+            except BaseException:
+                if not recorded:
+                    breaker.record_failure()
+                raise
+            
+            if attempt == retries["max_retries"] or delay > retries["max_retry_after"]:
+                break
+            await asyncio.sleep(delay)
+        
+        raise RobloxUnavailableError("Roblox API is busy", status=status, retry_after=delay)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get rate limiter and circuit breaker state per host"""
+        return {
+            host: {
+                "rate_limit": bucket.stats(),
+                "circuit_breaker": self._breakers[host].stats()
+            }
+            for host, bucket in list(self._buckets.items())
+        }
+
+# Caches for user lookups, keyed by lowercased username and by user ID
+_username_cache = TTLCache(
+    maxsize=ROBLOX_CACHE_CONFIG["max_entries"],
+    ttl=ROBLOX_CACHE_CONFIG["ttl"],
+    negative_ttl=ROBLOX_CACHE_CONFIG["negative_ttl"]
+)
+_user_cache = TTLCache(
+    maxsize=ROBLOX_CACHE_CONFIG["max_entries"],
+    ttl=ROBLOX_CACHE_CONFIG["ttl"],
+    negative_ttl=ROBLOX_CACHE_CONFIG["negative_ttl"]
+)
+
+# Cache of basic user records (id, name, displayName) from bulk lookups, keyed by user ID
+_user_summary_cache = TTLCache(
+    maxsize=ROBLOX_CACHE_CONFIG["max_entries"],
+    ttl=ROBLOX_CACHE_CONFIG["ttl"],
+    negative_ttl=ROBLOX_CACHE_CONFIG["negative_ttl"]
+)
+
+# Cache of final CDN URLs for avatar thumbnails, keyed by user ID
+_avatar_cache = TTLCache(
+    maxsize=ROBLOX_CACHE_CONFIG["max_entries"],
+    ttl=ROBLOX_CACHE_CONFIG["thumbnail_ttl"],
+    negative_ttl=ROBLOX_CACHE_CONFIG["negative_ttl"]
+)
+
+async def _fetch_usernames(usernames: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Resolve a batch of lowercased usernames in a single request"""
+    client = await get_client()
+    status, data = await client.request(
+        "POST",
+        f"{ROBLOX_USERS_API_BASE}/v1/usernames/users",
+        json={"usernames": usernames, "excludeBannedUsers": False}
+    )
+    if status != 200:
+        logger.error(f"Failed to get Roblox user ID: {status}")
+        raise RobloxAPIError("Failed to get Roblox user ID", status)
+    
+    _store_profiles(data.get("data", []))
+    
+    # Match each result back to the username it was requested with
+    return {
+        user_data["requestedUsername"].lower(): user_data
+        for user_data in data.get("data", [])
+    }
+
+# Username lookups made within a few milliseconds of each other share one request
+_username_batcher = MicroBatcher(
+    _fetch_usernames,
+    window=ROBLOX_BATCH_CONFIG["username_window"],
+    max_batch_size=ROBLOX_BATCH_CONFIG["username_batch_size"]
+)
+
+# Identical requests made at the same moment share a single in-flight call
+_inflight = SingleFlight()
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Get hit/miss counters for the Roblox lookup caches"""
+    return {
+        "usernames": _username_cache.stats(),
+        "users": _user_cache.stats(),
+        "user_summaries": _user_summary_cache.stats(),
+        "avatars": _avatar_cache.stats(),
+        "username_batches": _username_batcher.stats(),
+        "avatar_batches": _avatar_batcher.stats(),
+        "in_flight": _inflight.stats(),
+        "stored_profiles": dict(_profile_stats)
+    }
+
+# Client shared by all helpers below, normally created by the bot in setup_hook
+_client: Optional[RobloxClient] = None
+
+# Set by close_client(), so a handler still running during shutdown can't start a new session
+_shut_down = False
+
+def get_api_stats() -> Dict[str, Any]:
+    """Get rate limiter and circuit breaker state for monitoring"""
+    return _client.stats() if _client is not None else {}
+
+def set_client(client: Optional[RobloxClient]):
+    """Set the client used by the module-level helpers"""
+    global _client, _shut_down
+    _client = client
+    if client is not None:
+        _shut_down = False
+
+async def close_client():
+    """Close the shared client for good; later get_client() calls raise"""
+    global _client, _shut_down
+    _shut_down = True
+    client, _client = _client, None
+    if client is not None:
+        await client.close()
+
+async def get_client() -> RobloxClient:
+    """
+    Get the shared Roblox client, starting one if needed
+    
+    Raises:
+        RuntimeError: The client was closed with close_client()
+    """
+    global _client
+    if _shut_down:
+        raise RuntimeError("Roblox client has been shut down")
+    if _client is None:
+        _client = RobloxClient()
+    if _client.closed:
+        await _client.start()
+    return _client
+
+# Hits and misses for the roblox_profiles table, which keeps profiles across restarts
+_profile_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "errors": 0, "writes": 0, "skipped_writes": 0}
+
+# Name, display name, creation date and description hash of each profile this instance
+# stored, until the row goes stale, so repeat fetches of an unchanged user (each
+# verification poll, say) don't write again
+_profiles_written = TTLCache(
+    maxsize=ROBLOX_CACHE_CONFIG["max_entries"],
+    ttl=ROBLOX_CACHE_CONFIG["profile_soft_ttl"]
+)
+
+# Background refreshes and writes, kept referenced until they finish
+_background_tasks: Set[asyncio.Task] = set()
+
+def _run_in_background(coro):
+    """Run a refresh or write without making the caller wait for it"""
+    async def runner():
+        try:
+            await coro
+        except Exception as e:
+            logger.warning(f"Background Roblox task failed: {e}")
+    
+    task = asyncio.create_task(runner())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+def _parse_created(value: Any) -> Optional[datetime]:
+    """Convert Roblox's ISO 8601 creation date to a naive UTC datetime"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        created = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return created.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _profile_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a roblox_profiles row to the shape the Roblox API returns"""
+    user_data = {
+        "id": row["roblox_id"],
+        "name": row["username"],
+        "displayName": row["display_name"]
+    }
+    if row["created_at"] is not None:
+        user_data["created"] = row["created_at"]
+    return user_data
+
+async def _load_stored_profiles(where: str, value: Any) -> List[Tuple[Dict[str, Any], bool]]:
+    """Load stored profiles that aren't past the hard TTL, each with a flag saying if it's stale"""
+    if not ROBLOX_CACHE_CONFIG["persist_profiles"]:
+        return []
+    
+    try:
+        rows = await fetch_query(
+            f"""
+            SELECT roblox_id, username, display_name, created_at,
+                   fetched_at < CURRENT_TIMESTAMP - make_interval(secs => $2) AS stale
+            FROM roblox_profiles
+            WHERE {where} AND fetched_at >= CURRENT_TIMESTAMP - make_interval(secs => $3)
+            ORDER BY fetched_at DESC
+            """,
+            value,
+            float(ROBLOX_CACHE_CONFIG["profile_soft_ttl"]),
+            float(ROBLOX_CACHE_CONFIG["profile_hard_ttl"])
+        )
+    except Exception as e:
+        # The database is only a cache tier here, so fall back to the API
+        logger.warning(f"Could not read stored Roblox profiles: {e}")
+        _profile_stats["errors"] += 1
+        return []
+    
+    for row in rows:
+        _profile_stats["stale_hits" if row["stale"] else "hits"] += 1
+    return [(_profile_from_row(row), row["stale"]) for row in rows]
+
+def _description_hash(user_data: Dict[str, Any]) -> Optional[str]:
+    description = user_data.get("description")
+    return hashlib.sha256(description.encode()).hexdigest() if description is not None else None
+
+async def _save_profiles(users: List[Dict[str, Any]]):
+    """Insert or refresh stored profiles in a single statement"""
+    profiles = {user_data["id"]: user_data for user_data in users}
+    if not profiles:
+        return
+    
+    description_hashes = [_description_hash(user_data) for user_data in profiles.values()]
+    await execute_query(
+        """
+        INSERT INTO roblox_profiles (roblox_id, username, display_name, created_at, description_hash, fetched_at)
+        SELECT p.roblox_id, p.username, p.display_name, p.created_at, p.description_hash, CURRENT_TIMESTAMP
+        FROM unnest($1::bigint[], $2::text[], $3::text[], $4::timestamp[], $5::text[])
+            AS p(roblox_id, username, display_name, created_at, description_hash)
+        ON CONFLICT (roblox_id) DO UPDATE SET
+            username = EXCLUDED.username,
+            display_name = EXCLUDED.display_name,
+            created_at = COALESCE(EXCLUDED.created_at, roblox_profiles.created_at),
+            description_hash = COALESCE(EXCLUDED.description_hash, roblox_profiles.description_hash),
+            fetched_at = EXCLUDED.fetched_at
+        """,
+        list(profiles.keys()),
+        [user_data["name"] for user_data in profiles.values()],
+        [user_data.get("displayName") for user_data in profiles.values()],
+        [_parse_created(user_data.get("created")) for user_data in profiles.values()],
+        description_hashes
+    )
+
+async def _save_new_profiles(users: List[Dict[str, Any]]):
+    try:
+        await _save_profiles(users)
+    except Exception:
+        # Let the next fetch try again
+        for user_data in users:
+            _profiles_written.invalidate(user_data["id"])
+        raise
+
+def _store_profiles(users: List[Dict[str, Any]]):
+    """Write fetched profiles to the database in the background, unless stored recently and unchanged"""
+    if not users or not ROBLOX_CACHE_CONFIG["persist_profiles"]:
+        return
+    
+    changed = []
+    for user_data in users:
+        # Username lookups carry no creation date or description; the write keeps the
+        # stored ones then, so only the fields a record has count as changes
+        created = _parse_created(user_data.get("created"))
+        description_hash = _description_hash(user_data)
+        previous = _profiles_written.get(user_data["id"])
+        if previous is not MISSING:
+            created = created or previous[2]
+            description_hash = description_hash or previous[3]
+        stored = (user_data["name"], user_data.get("displayName"), created, description_hash)
+        if previous == stored:
+            _profile_stats["skipped_writes"] += 1
+            continue
+        _profiles_written.set(user_data["id"], stored)
+        changed.append(user_data)
+    
+    if changed:
+        _profile_stats["writes"] += len(changed)
+        _run_in_background(_save_new_profiles(changed))
+
+async def _fetch_user_details(user_id: int) -> Dict[str, Any]:
+    """Fetch a user's live profile and refresh the cache with it"""
+    client = await get_client()
+    status, data = await client.request("GET", f"{ROBLOX_USERS_API_BASE}/v1/users/{user_id}")
+    if status != 200:
+        raise RobloxAPIError("Failed to get Roblox user details", status)
+    
+    _user_cache.set(user_id, data)
+    _user_summary_cache.set(user_id, {key: data.get(key) for key in ("id", "name", "displayName")})
+    _store_profiles([data])
+    return data
+
+async def _refresh_username(cache_key: str):
+    """Look a username up again and replace whatever the cache holds for it"""
+    user_data = await _inflight.do(("username", cache_key), lambda: _username_batcher.load(cache_key))
+    if user_data:
+        _username_cache.set(cache_key, user_data)
+    else:
+        _username_cache.set_negative(cache_key)
+
+async def get_roblox_user(
+    username: str,
+    fields: Literal["id", "basic", "full"] = FIELDS_FULL,
+    live: bool = False
+) -> Optional[Dict[str, Any]]:
     """
     Get Roblox user information by username
     
     Args:
         username: The Roblox username to look up
+        fields: How much to fetch. FIELDS_ID and FIELDS_BASIC are answered by the
+            username lookup alone; FIELDS_FULL also fetches the profile details
+            (description, creation date), which costs a second request
+        live: Resolve the username with Roblox rather than from the cache or the
+            stored profiles. Names can be released and claimed by someone else,
+            so anything that links an account (verification) needs this; the
+            profile details are still served from the cache
     
     Returns:
         Dict containing user information or None if not found
+    
+    Raises:
+        RobloxUnavailableError: Roblox is rate limiting us or is degraded
     """
+    cache_key = username.lower()
+    
     try:
-        async with aiohttp.ClientSession() as session:
-            # First get the user ID from the username
-            async with session.post(
-                f"{ROBLOX_USERS_API_BASE}/v1/usernames/users",
-                json={"usernames": [username], "excludeBannedUsers": False}
-            ) as response:
-                if response.status != 200:
-                    logger.error(f"Failed to get Roblox user ID: {response.status}")
-                    return None
-                
-                data = await response.json()
-                if not data.get("data") or len(data["data"]) == 0:
-                    logger.info(f"No Roblox user found with username: {username}")
-                    return None
-                
-                user_data = data["data"][0]
-                user_id = user_data["id"]
-                
-                # Now get more detailed user information
-                async with session.get(f"{ROBLOX_USERS_API_BASE}/v1/users/{user_id}") as detail_response:
-                    if detail_response.status != 200:
-                        logger.error(f"Failed to get Roblox user details: {detail_response.status}")
-                        return user_data
-                    
-                    user_details = await detail_response.json()
-                    
-                    # Merge the user data
-                    user_data.update(user_details)
-                    
-                    return user_data
+        # First get the user ID from the username
+        user_data = MISSING if live else _username_cache.get(cache_key)
+        if user_data is MISSING:
+            # Then the database, if we've seen this user before
+            stored = [] if live else await _load_stored_profiles("LOWER(username) = $1", cache_key)
+            if stored:
+                user_data, stale = stored[0]
+                if stale:
+                    # Serve the stored profile now and refresh it, and the cache, for next time
+                    _run_in_background(_refresh_username(cache_key))
+            else:
+                _profile_stats["misses"] += 1
+                user_data = await _inflight.do(
+                    ("username", cache_key),
+                    lambda: _username_batcher.load(cache_key)
+                )
+            
+            if not user_data:
+                logger.info(f"No Roblox user found with username: {username}")
+                _username_cache.set_negative(cache_key)
+                return None
+            
+            _username_cache.set(cache_key, user_data)
+        elif user_data is None:
+            return None
+        
+        user_data = dict(user_data)
+        user_id = user_data["id"]
+        
+        if fields == FIELDS_ID:
+            return {"id": user_id, "name": user_data["name"]}
+        if fields == FIELDS_BASIC:
+            return user_data
+        
+        # Now get more detailed user information
+        user_details = _user_cache.get(user_id)
+        if user_details is MISSING:
+            try:
+                user_details = await _inflight.do(
+                    ("details", user_id),
+                    lambda: _fetch_user_details(user_id)
+                )
+            except RobloxUnavailableError:
+                # Report "busy" rather than quietly returning a partial profile
+                raise
+            except RobloxAPIError as e:
+                logger.error(f"Failed to get Roblox user details: {e.status}")
+                return user_data
+        
+        # Merge the user data
+        if user_details:
+            user_data.update(user_details)
+        
+        return user_data
     
+    except RobloxUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Error getting Roblox user: {e}")
         return None
@@ -69,25 +559,106 @@ async def verify_roblox_user(roblox_id: int, verification_code: str) -> bool:
         
     Returns:
         True if verified, False otherwise
+    
+    Raises:
+        RobloxUnavailableError: Roblox is rate limiting us or is degraded
     """
     try:
-        async with aiohttp.ClientSession() as session:
-            # Get user's profile description
-            async with session.get(f"{ROBLOX_USERS_API_BASE}/v1/users/{roblox_id}") as response:
-                if response.status != 200:
-                    logger.error(f"Failed to get Roblox user profile: {response.status}")
-                    return False
-                
-                data = await response.json()
-                description = data.get("description", "")
-                
-                # Check if verification code is in the description
-                return verification_code in description
+        # Always read the live profile here; concurrent checks for the same user share it
+        data = await _inflight.do(
+            ("details", roblox_id),
+            lambda: _fetch_user_details(roblox_id)
+        )
+        description = data.get("description", "")
+        
+        # Check if verification code is in the description
+        return verification_code in description
     
+    except RobloxUnavailableError:
+        raise
+    except RobloxAPIError as e:
+        logger.error(f"Failed to get Roblox user profile: {e.status}")
+        return False
     except Exception as e:
         logger.error(f"Error verifying Roblox user: {e}")
         return False
 
+async def _request_headshots(user_ids: List[int]) -> Tuple[Dict[int, Optional[str]], List[int]]:
+    """
+    Request headshot URLs for up to 100 users and cache the final ones
+    
+    Returns:
+        The URL (or None) for every user whose thumbnail is final, and the
+        users whose thumbnail Roblox is still rendering ("Pending")
+    """
+    client = await get_client()
+    params = {
+        "userIds": ",".join(str(user_id) for user_id in user_ids),
+        "size": ROBLOX_BATCH_CONFIG["thumbnail_size"],
+        "format": "Png",
+        "isCircular": "false"
+    }
+    status, data = await client.request(
+        "GET",
+        f"{ROBLOX_THUMBNAILS_API}/v1/users/avatar-headshot",
+        params=params
+    )
+    if status != 200:
+        raise RobloxAPIError("Failed to get Roblox avatar", status)
+    
+    results: Dict[int, Optional[str]] = {}
+    pending = []
+    for thumbnail in data.get("data", []):
+        user_id = thumbnail["targetId"]
+        if thumbnail.get("state") == "Pending":
+            pending.append(user_id)
+        elif thumbnail.get("state") == "Completed" and thumbnail.get("imageUrl"):
+            results[user_id] = thumbnail["imageUrl"]
+            _avatar_cache.set(user_id, thumbnail["imageUrl"])
+        else:
+            # Blocked, error or unknown user: remember there is no thumbnail for a while
+            results[user_id] = None
+            _avatar_cache.set_negative(user_id)
+    return results, pending
+
+# Users whose pending thumbnail is being re-polled in the background
+_avatars_repolling: Set[int] = set()
+
+async def _repoll_pending_avatars(user_ids: List[int]):
+    """Re-poll thumbnails still being rendered a few times, caching them once they're final"""
+    try:
+        remaining = user_ids
+        for _ in range(ROBLOX_BATCH_CONFIG["thumbnail_pending_retries"]):
+            await asyncio.sleep(ROBLOX_BATCH_CONFIG["thumbnail_pending_delay"])
+            _, remaining = await _request_headshots(remaining)
+            if not remaining:
+                break
+    finally:
+        _avatars_repolling.difference_update(user_ids)
+
+async def _fetch_avatars(user_ids: List[int]) -> Dict[int, Optional[str]]:
+    """
+    Fetch headshot URLs for a batch of users in a single request.
+    
+    Thumbnails Roblox is still rendering come back as "Pending". Those users
+    get None straight away, without holding up the rest of the batch, and are
+    re-polled in the background so a later lookup finds them in the cache.
+    """
+    results, pending = await _request_headshots(user_ids)
+    
+    repoll = [user_id for user_id in pending if user_id not in _avatars_repolling]
+    if repoll:
+        _avatars_repolling.update(repoll)
+        _run_in_background(_repoll_pending_avatars(repoll))
+    return results
+
+# Avatar lookups are gathered and sent in chunks of up to 100 user IDs
+_avatar_batcher = MicroBatcher(
+    _fetch_avatars,
+    window=ROBLOX_BATCH_CONFIG["thumbnail_window"],
+    max_batch_size=ROBLOX_BATCH_CONFIG["thumbnail_batch_size"]
+)
+
 async def get_roblox_avatar(roblox_id: int) -> Optional[str]:
     """
     Get the Roblox user's avatar URL
@@ -98,33 +669,118 @@ async def get_roblox_avatar(roblox_id: int) -> Optional[str]:
     Returns:
         Avatar URL or None if failed
     """
+    cached = _avatar_cache.get(roblox_id)
+    if cached is not MISSING:
+        return cached
+    
     try:
-        async with aiohttp.ClientSession() as session:
-            params = {
-                "userIds": roblox_id,
-                "size": "420x420",
-                "format": "Png",
-                "isCircular": "false"
-            }
-            
-            async with session.get(
-                f"{ROBLOX_THUMBNAILS_API}/v1/users/avatar-headshot",
-                params=params
-            ) as response:
-                if response.status != 200:
-                    logger.error(f"Failed to get Roblox avatar: {response.status}")
-                    return None
-                
-                data = await response.json()
-                if not data.get("data") or len(data["data"]) == 0:
-                    return None
-                
-                return data["data"][0]["imageUrl"]
+        return await _inflight.do(("avatar", roblox_id), lambda: _avatar_batcher.load(roblox_id))
     
+    except RobloxAPIError as e:
+        logger.error(f"Failed to get Roblox avatar: {e.status}")
+        return None
     except Exception as e:
         logger.error(f"Error getting Roblox avatar: {e}")
         return None
 
+async def get_roblox_avatars(roblox_ids: List[int]) -> Dict[int, Optional[str]]:
+    """
+    Get avatar URLs for many Roblox users at once
+    
+    Args:
+        roblox_ids: The Roblox user IDs
+        
+    Returns:
+        Dict mapping each user ID to its avatar URL, or None if unavailable
+    """
+    roblox_ids = list(dict.fromkeys(roblox_ids))
+    urls = await asyncio.gather(*(get_roblox_avatar(roblox_id) for roblox_id in roblox_ids))
+    return dict(zip(roblox_ids, urls))
+
+async def _fetch_users_by_ids(user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Fetch basic records for one chunk of user IDs in a single request"""
+    client = await get_client()
+    status, data = await client.request(
+        "POST",
+        f"{ROBLOX_USERS_API_BASE}/v1/users",
+        json={"userIds": user_ids, "excludeBannedUsers": False}
+    )
+    if status != 200:
+        raise RobloxAPIError("Failed to get Roblox users", status)
+    
+    _store_profiles(data.get("data", []))
+    return {user_data["id"]: user_data for user_data in data.get("data", [])}
+
+async def _refresh_user_summaries(user_ids: List[int]):
+    """Fetch stale users again and replace the stored copies in the cache"""
+    for roblox_id, user_data in (await _fetch_users_by_ids(user_ids)).items():
+        _user_summary_cache.set(roblox_id, user_data)
+
+async def get_users_by_ids(roblox_ids: List[int]) -> Dict[int, Optional[Dict[str, Any]]]:
+    """
+    Get basic information (id, name, displayName) for many Roblox users at once
+    
+    IDs that aren't cached are split into chunks of up to 100, which are
+    fetched concurrently with a bounded number of requests in flight.
+    
+    Args:
+        roblox_ids: The Roblox user IDs
+        
+    Returns:
+        Dict mapping each user ID to its user information, or None if not found
+    
+    Raises:
+        RobloxAPIError: A chunk could not be fetched (RobloxUnavailableError if Roblox is busy)
+    """
+    results: Dict[int, Optional[Dict[str, Any]]] = {}
+    missing = []
+    for roblox_id in dict.fromkeys(roblox_ids):
+        cached = _user_summary_cache.get(roblox_id)
+        if cached is MISSING:
+            missing.append(roblox_id)
+        else:
+            results[roblox_id] = dict(cached) if cached is not None else None
+    
+    if missing:
+        # Then the database, refreshing stale rows in the background
+        stale_ids = []
+        for user_data, stale in await _load_stored_profiles("roblox_id = ANY($1::bigint[])", missing):
+            summary = {key: user_data[key] for key in ("id", "name", "displayName")}
+            _user_summary_cache.set(user_data["id"], summary)
+            results[user_data["id"]] = dict(summary)
+            if stale:
+                stale_ids.append(user_data["id"])
+        
+        batch_size = ROBLOX_BATCH_CONFIG["users_batch_size"]
+        for i in range(0, len(stale_ids), batch_size):
+            _run_in_background(_refresh_user_summaries(stale_ids[i:i + batch_size]))
+        
+        missing = [roblox_id for roblox_id in missing if roblox_id not in results]
+        _profile_stats["misses"] += len(missing)
+    
+    if not missing:
+        return results
+    
+    batch_size = ROBLOX_BATCH_CONFIG["users_batch_size"]
+    semaphore = asyncio.Semaphore(ROBLOX_BATCH_CONFIG["users_max_concurrency"])
+    
+    async def fetch_chunk(chunk: List[int]) -> Dict[int, Dict[str, Any]]:
+        async with semaphore:
+            return await _fetch_users_by_ids(chunk)
+    
+    chunks = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+    for found in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks)):
+        for roblox_id, user_data in found.items():
+            _user_summary_cache.set(roblox_id, user_data)
+            results[roblox_id] = dict(user_data)
+    
+    for roblox_id in missing:
+        if roblox_id not in results:
+            _user_summary_cache.set_negative(roblox_id)
+            results[roblox_id] = None
+    
+    return results
+
 async def get_roblox_username_from_id(roblox_id: int) -> Optional[str]:
     """
     Get Roblox username from user ID
@@ -136,15 +792,16 @@ async def get_roblox_username_from_id(roblox_id: int) -> Optional[str]:
         Username or None if failed
     """
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{ROBLOX_API_BASE}/users/{roblox_id}") as response:
-                if response.status != 200:
-                    logger.error(f"Failed to get Roblox username: {response.status}")
-                    return None
-                
-                data = await response.json()
-                return data.get("Username")
+        users = await _inflight.do(
+            ("username_from_id", roblox_id),
+            lambda: get_users_by_ids([roblox_id])
+        )
+        user_data = users.get(roblox_id)
+        return user_data["name"] if user_data else None
     
+    except RobloxAPIError as e:
+        logger.error(f"Failed to get Roblox username: {e.status}")
+        return None
     except Exception as e:
         logger.error(f"Error getting Roblox username: {e}")
         return None
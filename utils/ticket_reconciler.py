@@ -0,0 +1,132 @@
+import asyncio
+import contextlib
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+import discord
+from config import TICKET_CONFIG
+from utils import queries
+from utils.database import fetch_rows, stream_query
+
+# Setup logging
+logger = logging.getLogger('discord_bot.ticket_reconciler')
+
+class TicketReconciler:
+    """
+    Background sweep that closes open tickets whose channel was deleted by hand.
+    
+    Runs once the bot is ready and then every `interval` seconds. Open tickets
+    are streamed grouped by guild and checked against the guild's cached
+    channels, so each sweep is one read of the open tickets plus one UPDATE per
+    `batch_size` orphans, with no Discord API calls. Guilds that aren't in the
+    cache (unavailable, or the bot was removed) are skipped rather than treated
+    as having no channels.
+    """
+    
+    def __init__(self, interval: float = 900, grace: float = 120, batch_size: int = 500):
+        self.interval = interval
+        self.grace = grace
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.sweeps = 0
+        self.failed_sweeps = 0
+        self.orphans_closed = 0
+        self.last_checked = 0
+        self.last_guilds_skipped = 0
+        self.last_sweep_ms: Optional[float] = None
+        self.last_sweep_at: Optional[datetime] = None
+    
+    async def reconcile(self, bot: discord.Client) -> int:
+        """
+        Close every open ticket whose channel is no longer in its guild
+        
+        Returns:
+            int: Number of tickets closed
+        """
+        started = time.perf_counter()
+        cutoff = datetime.now() - timedelta(seconds=self.grace)
+        orphans: List[int] = []
+        skipped_guilds: Set[int] = set()
+        checked = 0
+        
+        guild_id: Optional[int] = None
+        channel_ids: Optional[Set[int]] = None
+        async with contextlib.aclosing(stream_query(queries.OPEN_TICKETS_BEFORE, cutoff)) as tickets:
+            async for ticket in tickets:
+                checked += 1
+                if ticket.guild_id != guild_id:
+                    guild_id = ticket.guild_id
+                    guild = bot.get_guild(guild_id)
+                    if guild is None or guild.unavailable:
+                        channel_ids = None
+                        skipped_guilds.add(guild_id)
+                    else:
+                        channel_ids = {channel.id for channel in guild.channels}
+                
+                if channel_ids is not None and ticket.channel_id not in channel_ids:
+                    orphans.append(ticket.id)
+        
+        # Written once the stream has released its connection
+        closed = 0
+        closed_at = datetime.now()
+        for i in range(0, len(orphans), self.batch_size):
+            rows = await fetch_rows(queries.CLOSE_TICKETS, closed_at, orphans[i:i + self.batch_size])
+            closed += len(rows)
+        
+        self.sweeps += 1
+        self.orphans_closed += closed
+        self.last_checked = checked
+        self.last_guilds_skipped = len(skipped_guilds)
+        self.last_sweep_ms = round((time.perf_counter() - started) * 1000, 3)
+        self.last_sweep_at = closed_at
+        
+        if closed:
+            logger.info(f"Closed {closed} ticket(s) whose channel was deleted ({checked} open ticket(s) checked)")
+        return closed
+    
+    async def _run(self, bot: discord.Client):
+        await bot.wait_until_ready()
+        while True:
+            try:
+                await self.reconcile(bot)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed_sweeps += 1
+                logger.error(f"Error reconciling open tickets: {e}")
+            await asyncio.sleep(self.interval)
+    
+    def start(self, bot: discord.Client):
+        """Start sweeping once the bot is ready"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(bot))
+    
+    async def stop(self):
+        """Stop the sweep loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get sweep counters for monitoring"""
+        return {
+            "sweeps": self.sweeps,
+            "failed_sweeps": self.failed_sweeps,
+            "orphans_closed": self.orphans_closed,
+            "last_checked": self.last_checked,
+            "last_guilds_skipped": self.last_guilds_skipped,
+            "last_sweep_ms": self.last_sweep_ms,
+            "last_sweep_at": self.last_sweep_at.isoformat() if self.last_sweep_at else None
+        }
+
+# Closes tickets left open after their channel was deleted outside the bot
+ticket_reconciler = TicketReconciler(
+    interval=TICKET_CONFIG["reconcile_interval"],
+    grace=TICKET_CONFIG["reconcile_grace"],
+    batch_size=TICKET_CONFIG["reconcile_batch_size"]
+)
@@ -0,0 +1,195 @@
+import contextlib
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional
+from config import DATABASE_CONFIG
+from utils import queries
+from utils.cache import TTLCache, MISSING
+from utils.coalesce import KeyedLock, SingleFlight
+from utils.database import execute_query, fetchrow, fetchval, run_timed
+from utils.queries import TicketContextRow, TicketRow
+
+# Setup logging
+logger = logging.getLogger('discord_bot.ticket_repository')
+
+# Openings for the same member on this instance run one at a time, so a second
+# click finds the ticket the first one created. No database connection is held
+# while waiting, or while the channel is being created.
+_opening_locks = KeyedLock()
+
+# Seconds before a reservation left by an instance that died mid-opening can be taken over
+RESERVATION_TTL = float(DATABASE_CONFIG["ticket_reservation_ttl"])
+
+class TicketOpening:
+    """
+    A member's ticket being opened.
+    
+    Until the ticket_opening block ends, other openings for the same member
+    on this instance wait. Across instances, an opening that will create a
+    channel first takes a row in ticket_reservations, committed before the
+    channel is created; only an opening with reserved=True may create one.
+    record() still settles what gets past that (a reservation taken over
+    after expiring) with the one-open-ticket-per-member index.
+    """
+    
+    def __init__(self, guild_id: int, user_id: int, context: TicketContextRow, token: uuid.UUID):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.context = context
+        self.reserved = context.reserved
+        self._token = token
+        # Set by record()
+        self.ticket_id: Optional[int] = None
+    
+    async def record(self, channel_id: int, ticket_type: str) -> Optional[int]:
+        """
+        Record the new ticket channel
+        
+        The member's stale ticket (an open one whose channel was deleted) is
+        closed in the same short transaction as the insert. The ticket
+        reconciler normally closes those first; this covers the minutes
+        between sweeps.
+        
+        The reservation is only released when the ticket_opening block ends,
+        after the insert has committed, so an opening on another instance
+        almost always either finds it taken or sees the new ticket; the
+        unique index covers the rest.
+        
+        Args:
+            channel_id: The new ticket channel
+            ticket_type: 'general' or 'verification'
+        
+        Returns:
+            Optional[int]: None once recorded, or the channel of an open ticket
+                another instance recorded first. The caller should delete its
+                channel and point the member at that one.
+        """
+        args = (self.guild_id, channel_id, self.user_id, datetime.now(), ticket_type)
+        stale_channel_id = self.context.open_channel_id
+        
+        async def insert(conn):
+            async with conn.transaction():
+                if stale_channel_id is not None:
+                    await conn.execute(queries.CLOSE_STALE_TICKET.sql, stale_channel_id)
+                ticket_id = await conn.fetchval(queries.INSERT_TICKET.sql, *args)
+                if ticket_id is not None:
+                    return ticket_id, None
+                return None, await conn.fetchval(queries.OPEN_TICKET_CHANNEL.sql, self.guild_id, self.user_id)
+        
+        self.ticket_id, existing_channel_id = await run_timed(queries.INSERT_TICKET, args, insert)
+        if existing_channel_id is not None:
+            logger.warning(f"User {self.user_id} already had ticket channel {existing_channel_id} open")
+            return existing_channel_id
+        
+        # The first click on its buttons won't need a query
+        ticket_index.remember(TicketRow(self.ticket_id, self.guild_id, channel_id, self.user_id, ticket_type))
+        return None
+    
+    async def reserve(self) -> bool:
+        """
+        Reserve the opening after finding the member's open ticket stale
+        
+        Returns:
+            bool: False if another opening holds the reservation
+        """
+        if not self.reserved:
+            token = await fetchval(
+                queries.RESERVE_TICKET_OPENING,
+                self.guild_id, self.user_id, self._token, RESERVATION_TTL
+            )
+            self.reserved = token is not None
+        return self.reserved
+    
+    async def release(self):
+        """End the reservation, if this opening holds one"""
+        if not self.reserved:
+            return
+        self.reserved = False
+        try:
+            await execute_query(queries.RELEASE_TICKET_RESERVATION, self.guild_id, self.user_id, self._token)
+        except Exception as e:
+            # It expires after ticket_reservation_ttl anyway
+            logger.error(f"Error releasing ticket reservation for user {self.user_id}: {e}")
+
+@contextlib.asynccontextmanager
+async def ticket_opening(guild_id: int, user_id: int) -> AsyncIterator[TicketOpening]:
+    """
+    Open a ticket for a member, one opening at a time
+    
+    Waits for any other opening by the member on this instance, then loads the
+    member's open ticket, the ticket category and the support roles in one
+    query, which also reserves the opening if the member has no open ticket.
+    If they have one whose channel is gone, call reserve(). Create a channel
+    inside the block only if opening.reserved is True, and pass it to
+    record(); otherwise another instance is opening a ticket for the member.
+    The reservation is committed straight away, so no connection or
+    transaction is held in between; it is released when the block ends.
+    """
+    async with _opening_locks.hold((guild_id, user_id)):
+        token = uuid.uuid4()
+        context = await fetchrow(queries.TICKET_OPEN_CONTEXT, guild_id, user_id, token, RESERVATION_TTL)
+        opening = TicketOpening(guild_id, user_id, context, token)
+        try:
+            yield opening
+        finally:
+            await opening.release()
+
+class TicketIndex:
+    """
+    In-memory index of tickets by ID, for the persistent ticket buttons.
+    
+    Only the fields that never change after a ticket is opened are cached, so
+    entries never need invalidating; status changes go straight to the database
+    (see close_ticket). Unknown IDs are cached as None for a short while.
+    """
+    
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600):
+        self._cache = TTLCache(max_entries, ttl, negative_ttl=60)
+        self._loads = SingleFlight()
+    
+    async def get(self, ticket_id: int) -> Optional[TicketRow]:
+        """Get a ticket, loading it if it isn't cached; None if there's no such ticket"""
+        ticket = self._cache.get(ticket_id)
+        if ticket is not MISSING:
+            return ticket
+        return await self._loads.do(ticket_id, lambda: self._load(ticket_id))
+    
+    async def _load(self, ticket_id: int) -> Optional[TicketRow]:
+        ticket = await fetchrow(queries.TICKET_BY_ID, ticket_id)
+        self._cache.set(ticket_id, ticket)
+        return ticket
+    
+    async def get_by_channel(self, channel_id: int) -> Optional[TicketRow]:
+        """Find a ticket by its channel (for buttons sent before ticket IDs were in custom_ids)"""
+        ticket = await fetchrow(queries.TICKET_BY_CHANNEL, channel_id)
+        if ticket is not None:
+            self.remember(ticket)
+        return ticket
+    
+    def remember(self, ticket: TicketRow):
+        """Cache a ticket that was just created"""
+        self._cache.set(ticket.id, ticket)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters for monitoring"""
+        return self._cache.stats()
+
+# Tickets behind the Close and Delete buttons
+ticket_index = TicketIndex(
+    max_entries=DATABASE_CONFIG["ticket_index_max_entries"],
+    ttl=DATABASE_CONFIG["ticket_index_ttl"]
+)
+
+async def close_ticket(ticket_id: int) -> bool:
+    """
+    Mark a ticket closed
+    
+    Returns:
+        bool: False if it was already closed (e.g. a second click on Close)
+    """
+    return await fetchval(queries.CLOSE_TICKET, datetime.now(), ticket_id) is not None
+
+def get_ticket_lock_stats() -> Dict[str, Any]:
+    """Get in-process ticket lock counters for monitoring"""
+    return _opening_locks.stats()
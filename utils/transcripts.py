@@ -0,0 +1,220 @@
+import abc
+import asyncio
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Set, TextIO
+import discord
+from config import TICKET_CONFIG
+from utils import queries
+from utils.database import execute_query
+from utils.queries import TicketRow
+
+# Setup logging
+logger = logging.getLogger('discord_bot.transcripts')
+
+class TranscriptStore(abc.ABC):
+    """
+    Where finished transcripts are kept.
+    
+    Subclass this and implement save() to send them somewhere other than local
+    disk (object storage, for instance).
+    """
+    
+    @abc.abstractmethod
+    async def save(self, staged_path: str, name: str) -> str:
+        """
+        Take ownership of a finished transcript file
+        
+        Args:
+            staged_path: Temporary file holding the transcript; the store moves or removes it
+            name: Relative name to keep it under, e.g. "123/45-678.jsonl.gz"
+        
+        Returns:
+            str: Location recorded on the ticket (a path, URL or key)
+        """
+
+class LocalTranscriptStore(TranscriptStore):
+    """Keeps transcripts in a directory on local disk"""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+    
+    async def save(self, staged_path: str, name: str) -> str:
+        destination = os.path.join(self.directory, name)
+        await asyncio.to_thread(self._move, staged_path, destination)
+        return destination
+    
+    @staticmethod
+    def _move(source: str, destination: str):
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.move(source, destination)
+
+def serialize_message(message: discord.Message) -> Dict[str, Any]:
+    """Turn a message into one transcript line"""
+    return {
+        "id": message.id,
+        "author_id": message.author.id,
+        "author": str(message.author),
+        "bot": message.author.bot,
+        "created_at": message.created_at.isoformat(),
+        "edited_at": message.edited_at.isoformat() if message.edited_at else None,
+        "content": message.content,
+        "attachments": [attachment.url for attachment in message.attachments],
+        "embeds": [embed.to_dict() for embed in message.embeds],
+        "reply_to": message.reference.message_id if message.reference else None
+    }
+
+def _write_lines(file: TextIO, lines: List[str]):
+    file.write("\n".join(lines) + "\n")
+
+class TranscriptArchiver:
+    """
+    Background workers that save ticket channels as gzipped JSONL before
+    they're deleted.
+    
+    History is streamed oldest first and written a page at a time, with the
+    compression and disk writes done in a thread, so a long channel is never
+    held in memory and doesn't block the event loop. At most `workers`
+    channels are read at once, which keeps history requests well inside
+    Discord's rate limits when many tickets are deleted together.
+    
+    A channel is only deleted once its transcript is saved and recorded on
+    the ticket; if archiving fails the channel is kept and staff are told.
+    """
+    
+    def __init__(self, store: TranscriptStore, workers: int = 2, max_queue: int = 100, page_size: int = 100):
+        self.store = store
+        self.workers = workers
+        self.max_queue = max_queue
+        self.page_size = page_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Tickets queued or being archived, so a second click doesn't archive twice
+        self._pending: Set[int] = set()
+        self.archived = 0
+        self.failed = 0
+        self.messages_archived = 0
+    
+    def is_pending(self, ticket_id: int) -> bool:
+        """Check whether a ticket is already queued or being archived"""
+        return ticket_id in self._pending
+    
+    def submit(self, ticket: TicketRow, channel: discord.TextChannel, reason: Optional[str] = None) -> bool:
+        """
+        Queue a ticket channel to be archived and then deleted
+        
+        Returns:
+            bool: False if the queue is full (or the archiver isn't running)
+        """
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait((ticket, channel, reason))
+        except asyncio.QueueFull:
+            return False
+        self._pending.add(ticket.id)
+        return True
+    
+    async def archive(self, ticket: TicketRow, channel: discord.TextChannel) -> str:
+        """
+        Save a channel's history and record where it went on the ticket
+        
+        Returns:
+            str: The transcript's location in the store
+        """
+        fd, staged_path = tempfile.mkstemp(prefix=f"ticket-{ticket.id}-", suffix=".jsonl.gz")
+        os.close(fd)
+        try:
+            messages = 0
+            file = await asyncio.to_thread(gzip.open, staged_path, "wt", encoding="utf-8")
+            try:
+                page = []
+                async for message in channel.history(limit=None, oldest_first=True):
+                    page.append(json.dumps(serialize_message(message), ensure_ascii=False))
+                    if len(page) >= self.page_size:
+                        await asyncio.to_thread(_write_lines, file, page)
+                        messages += len(page)
+                        page = []
+                if page:
+                    await asyncio.to_thread(_write_lines, file, page)
+                    messages += len(page)
+            finally:
+                await asyncio.to_thread(file.close)
+            
+            name = f"{ticket.guild_id}/{ticket.id}-{ticket.channel_id}.jsonl.gz"
+            location = await self.store.save(staged_path, name)
+        finally:
+            if os.path.exists(staged_path):
+                os.remove(staged_path)
+        
+        await execute_query(queries.SET_TICKET_TRANSCRIPT, location, ticket.id)
+        self.messages_archived += messages
+        logger.info(f"Archived {messages} message(s) from ticket {ticket.id} to {location}")
+        return location
+    
+    async def _run(self):
+        while True:
+            ticket, channel, reason = await self._queue.get()
+            try:
+                try:
+                    await self.archive(ticket, channel)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"Error archiving ticket {ticket.id}: {e}")
+                    try:
+                        await channel.send("Couldn't save this ticket's transcript, so the channel was kept. Please try again later.")
+                    except discord.HTTPException:
+                        pass
+                    continue
+                
+                self.archived += 1
+                try:
+                    await channel.delete(reason=reason)
+                except discord.HTTPException as e:
+                    logger.error(f"Error deleting archived ticket channel {channel.id}: {e}")
+            finally:
+                self._pending.discard(ticket.id)
+                self._queue.task_done()
+    
+    def start(self):
+        """Start the archiving workers"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(self.max_queue)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+    
+    async def stop(self):
+        """Stop the workers; queued channels are left in place, undeleted"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        
+        if self._queue is not None and self._queue.qsize():
+            logger.warning(f"Shut down with {self._queue.qsize()} ticket(s) waiting to be archived")
+        self._queue = None
+        self._pending.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get queue and archive counters for monitoring"""
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "in_progress": len(self._pending) - (self._queue.qsize() if self._queue is not None else 0),
+            "archived": self.archived,
+            "failed": self.failed,
+            "messages_archived": self.messages_archived
+        }
+
+# Saves ticket channels before the Delete button removes them
+transcript_archiver = TranscriptArchiver(
+    LocalTranscriptStore(TICKET_CONFIG["transcript_dir"]),
+    workers=TICKET_CONFIG["transcript_workers"],
+    max_queue=TICKET_CONFIG["transcript_max_queue"],
+    page_size=TICKET_CONFIG["transcript_page_size"]
+)
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+from utils.resilience import TokenBucket
+from utils.roblox_api import verify_roblox_user, RobloxUnavailableError
+
+# Setup logging
+logger = logging.getLogger('discord_bot.verification_poller')
+
+class VerificationSession:
+    """A pending check for a verification code in a Roblox profile"""
+    
+    def __init__(
+        self,
+        key: Hashable,
+        roblox_id: int,
+        verification_code: str,
+        on_verified: Callable[["VerificationSession"], Awaitable[None]],
+        on_expired: Optional[Callable[["VerificationSession"], Awaitable[None]]],
+        first_poll_in: float
+    ):
+        self.key = key
+        self.roblox_id = roblox_id
+        self.verification_code = verification_code
+        self.on_verified = on_verified
+        self.on_expired = on_expired
+        self.created_at = time.monotonic()
+        self.interval = first_poll_in
+        self.next_poll_at = self.created_at + first_poll_in
+        self.polls = 0
+        
+        # Latest result, read by the "Verify" button instead of fetching the profile again
+        self.verified = False
+        # Set when on_verified couldn't finish and the session went back to polling
+        self.completion_failed = False
+        self.busy = False
+        self.expired = False
+        self.cancelled = False
+    
+    @property
+    def active(self) -> bool:
+        return not (self.verified or self.expired or self.cancelled)
+
+class VerificationPoller:
+    """
+    Polls the Roblox profiles of pending verification sessions in the
+    background and completes each link as soon as its code shows up.
+    
+    Each session is polled on its own backoff (the interval grows after every
+    miss), due sessions are checked in batches, and all polls share one token
+    bucket so the poller never exceeds requests_per_second.
+    """
+    
+    def __init__(
+        self,
+        min_interval: float = 5,
+        max_interval: float = 30,
+        backoff: float = 1.5,
+        session_timeout: float = 840,
+        requests_per_second: float = 5,
+        batch_size: int = 10
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.session_timeout = session_timeout
+        self.batch_size = batch_size
+        self._bucket = TokenBucket(requests_per_second, requests_per_second)
+        self._sessions: Dict[Hashable, VerificationSession] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._callbacks: Set[asyncio.Task] = set()
+        self.polls_sent = 0
+        self.sessions_verified = 0
+    
+    def add(
+        self,
+        key: Hashable,
+        roblox_id: int,
+        verification_code: str,
+        on_verified: Callable[[VerificationSession], Awaitable[None]],
+        on_expired: Optional[Callable[[VerificationSession], Awaitable[None]]] = None
+    ) -> VerificationSession:
+        """Start polling for a verification code, replacing any session with the same key"""
+        previous = self._sessions.get(key)
+        if previous is not None:
+            previous.cancelled = True
+        
+        session = VerificationSession(key, roblox_id, verification_code, on_verified, on_expired, self.min_interval)
+        self._sessions[key] = session
+        self._wake.set()
+        return session
+    
+    def cancel(self, session: VerificationSession):
+        """Stop polling for a session"""
+        session.cancelled = True
+        if self._sessions.get(session.key) is session:
+            del self._sessions[session.key]
+    
+    def retry(self, session: VerificationSession):
+        """Poll a verified session again after its on_verified callback failed, so it runs again"""
+        if session.cancelled or session.expired or self._sessions.get(session.key, session) is not session:
+            # Replaced by a newer session, or over
+            return
+        
+        session.verified = False
+        session.completion_failed = True
+        session.interval = self.min_interval
+        session.next_poll_at = time.monotonic() + self.min_interval
+        self._sessions[session.key] = session
+        self._wake.set()
+    
+    def nudge(self, session: VerificationSession):
+        """Poll a session again soon, e.g. after the user says they've added the code"""
+        if not session.active:
+            return
+        
+        session.interval = self.min_interval
+        session.next_poll_at = min(session.next_poll_at, time.monotonic() + 1)
+        self._wake.set()
+    
+    def start(self):
+        """Start the background polling loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the polling loop and drop all pending sessions"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        for session in self._sessions.values():
+            session.cancelled = True
+        self._sessions.clear()
+    
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            now = time.monotonic()
+            
+            # Drop sessions that were replaced, cancelled or have run out of time
+            for key, session in list(self._sessions.items()):
+                if not session.active:
+                    del self._sessions[key]
+                elif now - session.created_at >= self.session_timeout:
+                    session.expired = True
+                    del self._sessions[key]
+                    if session.on_expired is not None:
+                        self._run_callback(session.on_expired, session)
+            
+            due = sorted(
+                (session for session in self._sessions.values() if session.next_poll_at <= now),
+                key=lambda session: session.next_poll_at
+            )[:self.batch_size]
+            
+            if due:
+                await asyncio.gather(*(self._poll(session) for session in due))
+                continue
+            
+            # Sleep until the next session is due, or until a session is added or nudged
+            if self._sessions:
+                timeout = min(session.next_poll_at for session in self._sessions.values()) - now
+            else:
+                timeout = None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _poll(self, session: VerificationSession):
+        """Check one session's profile and schedule its next poll"""
+        await self._bucket.acquire()
+        if not session.active:
+            return
+        
+        self.polls_sent += 1
+        session.polls += 1
+        try:
+            verified = await verify_roblox_user(session.roblox_id, session.verification_code)
+            session.busy = False
+        except RobloxUnavailableError as e:
+            verified = False
+            session.busy = True
+            session.interval = max(session.interval, e.retry_after or 0)
+        except Exception as e:
+            logger.error(f"Error polling verification session: {e}")
+            verified = False
+        
+        if not session.active:
+            return
+        
+        if verified:
+            session.verified = True
+            if self._sessions.get(session.key) is session:
+                del self._sessions[session.key]
+            self.sessions_verified += 1
+            self._run_callback(session.on_verified, session)
+            return
+        
+        session.interval = min(self.max_interval, session.interval * self.backoff)
+        session.next_poll_at = time.monotonic() + session.interval
+    
+    def _run_callback(self, callback: Callable[[VerificationSession], Awaitable[None]], session: VerificationSession):
+        """Run a session callback without holding up the polling loop"""
+        async def runner():
+            try:
+                await callback(session)
+            except Exception as e:
+                logger.error(f"Error in verification session callback: {e}")
+        
+        task = asyncio.create_task(runner())
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get poller counters for monitoring"""
+        return {
+            "pending_sessions": len(self._sessions),
+            "polls_sent": self.polls_sent,
+            "sessions_verified": self.sessions_verified
+        }